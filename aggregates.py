@@ -0,0 +1,175 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from frames import compact_cells
+
+
+class AggregateCube:
+    """
+    Period × category × merchant sums for one date range and analysis unit.
+
+    Built once from the ledger; every dashboard view (summary metrics and pie,
+    favorite stores, line chart, net spend table) is a roll-up of these cells,
+    and each roll-up or rendered chart is memoized on the cube itself.
+
+    `cells` has categorical Period, Category and Merchant columns and integer
+    Cents, OutcomeCents (sum of amounts >= 0), RefundCents (sum of amounts < 0)
+    and Count columns. Roll-ups are summed in cents and returned in dollars.
+    """
+    def __init__(self, cells, unit):
+        self.cells = cells
+        self.unit = unit
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @property
+    def empty(self):
+        return self.cells.empty
+
+    def memo(self, name, compute):
+        """
+        Returns compute() once per cube, e.g. for PNG bytes of a rendered chart.
+        """
+        with self._lock:
+            if name in self._memo:
+                return self._memo[name]
+        value = compute()
+        with self._lock:
+            return self._memo.setdefault(name, value)
+
+    def totals(self):
+        """
+        :return: dict with 'refund' (sum of negative amounts), 'outcome' (sum of positive amounts) and 'net'.
+        """
+        return self.memo('totals', lambda: {
+            'refund': self.cells['RefundCents'].sum() / 100,
+            'outcome': self.cells['OutcomeCents'].sum() / 100,
+            'net': self.cells['Cents'].sum() / 100,
+        })
+
+    def _sum_by(self, columns):
+        # observed=True: only labels present in the cells, not every category of the dtype
+        return (self.cells.groupby(columns, observed=True)['Cents'].sum() / 100).rename('Amount')
+
+    def category_totals(self):
+        return self.memo('category_totals', lambda: self._sum_by('Category'))
+
+    def merchant_totals(self):
+        return self.memo('merchant_totals', lambda: self._sum_by('Merchant').sort_values(ascending=False))
+
+    def period_totals(self):
+        return self.memo('period_totals', lambda: self._sum_by('Period'))
+
+    def period_category_pivot(self):
+        """
+        :return: Net spend table indexed by period label in time order, one column per category.
+        """
+        def pivot():
+            table = self._sum_by(['Period', 'Category']).unstack(fill_value=0)
+            table.index = table.index.astype(str)
+            table.columns = table.columns.astype(str)
+            table.index.name = None
+            table.columns.name = None
+            return table
+        return self.memo('period_category_pivot', pivot)
+
+    def nbytes(self):
+        """
+        Memory held by the cells (the memoized roll-ups are small next to them).
+        """
+        return int(self.cells.memory_usage(index=True, deep=True).sum())
+
+
+def _iso(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def build_cube(ledger, start_date, end_date, unit):
+    """
+    Aggregates the ledger rows of [start_date, end_date] into an AggregateCube, inside sqlite.
+    """
+    cells = ledger.aggregate(start_date, end_date, unit, by=('category', 'merchant'))
+    return AggregateCube(cells, unit)
+
+
+def update_cube(cube, ledger, start_date, end_date, first, last):
+    """
+    Returns a new cube with only the periods overlapping the changed dates
+    [first, last] re-aggregated; all other cells are carried over from `cube`.
+    """
+    start_date, end_date = _iso(start_date), _iso(end_date)
+    first, last = max(first, start_date), min(last, end_date)
+    if first > last:
+        # the change is outside this cube's range
+        return AggregateCube(cube.cells, cube.unit)
+    first_label, last_label, first_day, last_day = ledger.period_span(first, last, cube.unit)
+    fresh = ledger.aggregate(max(first_day, start_date), min(last_day, end_date),
+                             cube.unit, by=('category', 'merchant'))
+    # compare the few period labels, not every row
+    periods = cube.cells['Period'].cat
+    outside = np.asarray((periods.categories < first_label) | (periods.categories > last_label))
+    kept = cube.cells[outside[periods.codes.to_numpy()]]
+    # categoricals with different categories concatenate to object columns, compacted again below
+    parts = [part for part in (kept, fresh) if not part.empty] or [fresh]
+    cells = (pd.concat(parts, ignore_index=True)
+             .sort_values(['Period', 'Category', 'Merchant'], ignore_index=True))
+    return AggregateCube(compact_cells(cells), cube.unit)
+
+
+class CubeCache:
+    """
+    Bounded LRU of AggregateCubes keyed on (ledger, ledger version, config key,
+    date range, unit), so switching tabs or analysis dimensions back and forth
+    reuses the cubes already built.
+
+    After a ledger write, a cube of an older version is brought up to date by
+    re-aggregating only the periods the write touched (see update_cube); a
+    config edit relabels the whole ledger and rebuilds the cube.
+    """
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cubes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ledger, start_date, end_date, unit, config_key=None):
+        """
+        :param config_key: Anything identifying the merchant map + category config contents.
+        """
+        key = ((ledger.path, id(ledger)), ledger.version, config_key, _iso(start_date), _iso(end_date), unit)
+        with self._lock:
+            cube = self._cubes.get(key)
+            if cube is not None:
+                self._cubes.move_to_end(key)
+                self.hits += 1
+                return cube
+            self.misses += 1
+            stale_key = next((k for k in reversed(self._cubes) if k[0] == key[0] and k[2:] == key[2:]), None)
+            stale = self._cubes.pop(stale_key) if stale_key is not None else None
+
+        span = ledger.changed_dates(stale_key[1]) if stale is not None else None
+        if span is None:
+            cube = build_cube(ledger, start_date, end_date, unit)
+        elif span[0] is None:
+            cube = AggregateCube(stale.cells, unit)
+        else:
+            cube = update_cube(stale, ledger, start_date, end_date, *span)
+        with self._lock:
+            self._cubes[key] = cube
+            while len(self._cubes) > self.maxsize:
+                self._cubes.popitem(last=False)
+        return cube
+
+    def clear(self):
+        with self._lock:
+            self._cubes.clear()
+
+    def nbytes(self):
+        with self._lock:
+            cubes = list(self._cubes.values())
+        return sum(cube.nbytes() for cube in cubes)
+
+    def __len__(self):
+        return len(self._cubes)
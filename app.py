@@ -1,11 +1,102 @@
 import streamlit as st
 import os
-import pandas as pd
-import fitz
 import re
+import uuid
+import pandas as pd
 from datetime import date
-from view import display_overall_summary,favorite_stores, plot_net_spend, plot_linear_spending
-from general_pdf_extrract import extract_transactions_dynamically
+from view import display_overall_summary,favorite_stores, plot_net_spend, plot_linear_spending, PERIOD_UNITS, merchant_map, category_cfg, get_normalizer, get_categorizer
+from aggregates import CubeCache
+from templates import TemplateRegistry
+from ingest import IngestQueue, archive_pdf
+from parsers import REGISTRY as PARSERS
+from ledger import LedgerPool
+from frames import memory_report, process_rss_mb
+from exports import ExportCache, FORMATS, available_formats, combined_export, statement_export
+from parse_cache import ParseCache
+import instrument
+
+# multi-session server mode: every browser session gets its own ledger under this directory
+SESSION_STORAGE_DIR = os.environ.get('SESSION_STORAGE_DIR')
+# caps of the parse cache shared by all sessions; the memory tier is off at 0
+PARSE_CACHE_MEMORY_MB = int(os.environ.get('PARSE_CACHE_MEMORY_MB', 64))
+PARSE_CACHE_DISK_MB = int(os.environ.get('PARSE_CACHE_DISK_MB', 256))
+# session ledgers kept open at once; idle ones past this are closed and reopened when needed
+MAX_OPEN_LEDGERS = int(os.environ.get('MAX_OPEN_LEDGERS', 32))
+
+@st.cache_resource
+def get_parse_cache():
+    # one content-addressed cache shared by every rerun and session of this process
+    return ParseCache('.parse_cache', max_bytes=PARSE_CACHE_DISK_MB * 2**20,
+                      max_memory_bytes=PARSE_CACHE_MEMORY_MB * 2**20)
+
+@st.cache_resource
+def get_ledger_pool():
+    # one Ledger per sqlite file, shared by reruns and the ingest thread, since its version counts the writes
+    return LedgerPool(max_open=MAX_OPEN_LEDGERS)
+
+def get_ledger(path=None):
+    # parsed transactions persist across restarts in a local sqlite file
+    path = path or 'ledger.db'
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return get_ledger_pool().get(path)
+
+_SESSION_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+def session_id():
+    # kept in the URL, so a reload finds the same storage; anything not shaped like our ids is replaced
+    if 'session_id' not in st.session_state:
+        requested = st.query_params.get('session')
+        st.session_state.session_id = (requested if requested and _SESSION_ID_RE.fullmatch(requested)
+                                       else uuid.uuid4().hex)
+    if st.query_params.get('session') != st.session_state.session_id:
+        st.query_params['session'] = st.session_state.session_id
+    return st.session_state.session_id
+
+def session_ledger_path():
+    # None (the shared ledger.db) unless sessions are isolated
+    if not SESSION_STORAGE_DIR:
+        return None
+    return os.path.join(SESSION_STORAGE_DIR, session_id(), 'ledger.db')
+
+def session_ledger():
+    return get_ledger(session_ledger_path())
+
+@st.cache_resource
+def get_templates():
+    # learned statement layouts, so repeat statements skip pattern discovery
+    return TemplateRegistry('templates.json')
+
+def store_statement(name, key, df, ledger_path):
+    # runs on the ingest queue's worker thread; the owner of a job is the session's ledger path
+    ledger = get_ledger(ledger_path)
+    digest, parser_version = ParseCache.split_key(key)
+    # a statement stored by an older parser is re-parsed in place, not stored a second time
+    stale = ledger.statement_version(digest) not in (None, parser_version)
+    ledger.add_statement(name, digest, df, get_normalizer(merchant_map), get_categorizer(category_cfg),
+                         replace=stale, parser_version=parser_version)
+
+@st.cache_resource
+def get_ingest_queue():
+    # one background parser for every session; statuses are looked up by content key and ledger
+    return IngestQueue(store_statement, cache=get_parse_cache(), templates=get_templates())
+
+@st.cache_resource
+def get_cube_cache():
+    # aggregate cubes shared by every session; keys include the ledger version
+    return CubeCache(maxsize=16)
+
+@st.cache_resource
+def get_export_cache():
+    # serialized downloads shared by every session, built only when asked for
+    return ExportCache()
+
+# optional content-addressed archive of the original PDFs; only parsed results are kept otherwise
+ARCHIVE_DIR = os.environ.get('STATEMENT_ARCHIVE_DIR')
+
+def labels_key():
+    # identifies the merchant map + category config contents
+    return f"{merchant_map.content_hash()}:{category_cfg.content_hash()}"
 
 def upload_pdf():
     # single uploader that shows built-in list + delete
@@ -15,50 +106,122 @@ def upload_pdf():
         accept_multiple_files=True, 
         key="pdf_uploader"
     )
+    # uploads are tracked by the uploader's file id, so two files with the same name are
+    # both kept; a file removed from the uploader takes its statement out of the ledger and the totals
+    current = {file.file_id for file in uploaded or []}
+    for file_id in [file_id for file_id in st.session_state.uploaded_pdfs if file_id not in current]:
+        remove_upload(file_id)
     if uploaded:
         for file in uploaded:
             # process each newly added PDF only once
-            if file.name not in st.session_state.uploaded_pdfs:
-                # 1) save
-                os.makedirs("uploads", exist_ok=True)
-                path = os.path.join("uploads", file.name)
-                with open(path, "wb") as f:
-                    f.write(file.read())
+            if file.file_id not in st.session_state.uploaded_pdfs:
+                # 1) keep a view of the uploaded buffer (no copy, no uploads/ file); show_csv hands it
+                #    to the background parser, which drops it once stored in the ledger
+                pdf_bytes = file.getbuffer()
+                st.session_state.pdf_keys[file.file_id] = ParseCache.key(pdf_bytes)
+                st.session_state.pending_pdfs[file.file_id] = (file.name, pdf_bytes)
+                if ARCHIVE_DIR:
+                    archive_pdf(pdf_bytes, ARCHIVE_DIR)
                 st.success(f"Processed {file.name}")
-                st.session_state.uploaded_pdfs.append(file.name)    
+                st.session_state.uploaded_pdfs.append(file.file_id)
                 
+def remove_upload(file_id):
+    st.session_state.uploaded_pdfs.remove(file_id)
+    st.session_state.pending_pdfs.pop(file_id, None)
+    key = st.session_state.pdf_keys.pop(file_id, None)
+    if key is None or key in st.session_state.pdf_keys.values():
+        # the same PDF is still uploaded as another file
+        return
+    ledger = session_ledger()
+    statement_id = ledger.find_statement(ParseCache.split_key(key)[0])
+    if statement_id is not None:
+        ledger.remove_statement(statement_id)
+
 def show_csv():
-    # extract & cache
-    for file in st.session_state.uploaded_pdfs:
-        path = os.path.join("uploads", file)
-        doc = fitz.open(path)
-        full_text = "".join(page.get_text() for page in doc)
-        lines = [line.strip() for line in full_text.split('\n') if line.strip()]
-
-        df = extract_transactions_dynamically(lines)
-        start_date = pd.to_datetime(df['Date'].iloc[0]).date()
-        end_date = pd.to_datetime(df['Date'].iloc[-1]).date()
-        domain = f"{start_date}_to_{end_date}"
-        st.session_state.pdf_dfs[domain] = df
-
-    # List uploaded Excel/spreadsheets
-    excel_list = st.session_state.pdf_dfs
-    if excel_list:
-        for domain, df in excel_list.items():
-            col1, col2 = st.columns([4, 1])
+    ledger = session_ledger()
+    normalizer = get_normalizer(merchant_map)
+    categorizer = get_categorizer(category_cfg)
+    # relabel stored rows if the merchant map or categories were edited
+    with instrument.stage('refresh_labels'):
+        ledger.refresh_labels(normalizer, categorizer, labels_key())
+
+    # hand every pending upload that is not in the ledger yet, or was parsed by an older parser, to the background parser
+    ingest_queue = get_ingest_queue()
+    for file_id in list(st.session_state.pending_pdfs):
+        key = st.session_state.pdf_keys[file_id]
+        name, data = st.session_state.pending_pdfs.pop(file_id)
+        digest, parser_version = ParseCache.split_key(key)
+        if ledger.statement_version(digest) != parser_version:
+            ingest_queue.submit(name, key, data, owner=session_ledger_path(),
+                                session=st.session_state.instrument_session)
+    # the dashboard below is drawn from what the ledger holds now
+    st.session_state.ledger_version = ledger.version
+    st.session_state.ingest_active = any(status.state in (IngestQueue.QUEUED, IngestQueue.PARSING)
+                                         for status in session_ingest_statuses())
+    # while files are parsing, only the status fragment reruns, once a second
+    st.fragment(show_ingest_status, run_every=1.0 if st.session_state.ingest_active else None)()
+
+    # List stored statements
+    statements = ledger.statements()
+    if not statements.empty:
+        for statement in statements.itertuples():
+            # statements stored without dates by older versions are listed by file name
+            domain = (f"{statement.start_date}_to_{statement.end_date}" if statement.start_date
+                      else os.path.splitext(statement.source)[0])
+            col1, col2, col3 = st.columns([3, 1, 1])
             with col1:
                 st.write(f"{domain}.csv")
+                if statement.duplicate_count:
+                    st.caption(f"{statement.source}: {statement.duplicate_count} duplicate transactions skipped")
             with col2:
-                st.download_button(
-                    label="📥", 
-                    data=df.to_csv(index=False),
-                    file_name=f"{domain}.csv",
-                    mime="text/csv",
-                    key=f"download_{domain}"
-                )
+                # the CSV is only serialized once asked for, then reused from the export cache
+                if statement.id in st.session_state.export_ready or st.button(
+                        "📄", key=f"prepare_{statement.id}", help="Prepare download"):
+                    st.session_state.export_ready.add(statement.id)
+                    st.download_button(
+                        label="📥",
+                        data=statement_export(get_export_cache(), ledger, statement.id,
+                                              statement.content_key, labels_key()),
+                        file_name=f"{domain}.csv",
+                        mime="text/csv",
+                        key=f"download_{statement.id}"
+                    )
+            with col3:
+                if st.button("🗑", key=f"remove_{statement.id}", help="Remove from the ledger"):
+                    ledger.remove_statement(statement.id)
+                    st.rerun()
     else:
         st.write("No spreadsheets uploaded yet.")
         
+INGEST_ICONS = {IngestQueue.QUEUED: "⏳", IngestQueue.PARSING: "⚙️"}
+
+def session_ingest_statuses():
+    # background parser status of this session's uploads
+    ingest_queue = get_ingest_queue()
+    owner = session_ledger_path()
+    statuses = (ingest_queue.status(key, owner) for key in set(st.session_state.pdf_keys.values()))
+    return [status for status in statuses if status is not None]
+
+def show_ingest_status():
+    """
+    Per-file status and progress of this session's uploads in the background parser.
+    Reruns the whole app when a statement was stored or the last file finished,
+    so the dashboard includes it and the fragment stops polling.
+    """
+    statuses = session_ingest_statuses()
+    active = [status for status in statuses if status.state in (IngestQueue.QUEUED, IngestQueue.PARSING)]
+    if active:
+        finished = len(statuses) - len(active)
+        st.progress(finished / len(statuses), text=f"Parsing statements: {finished} / {len(statuses)}")
+        for status in active:
+            st.caption(f"{INGEST_ICONS[status.state]} {status.name}: {status.state}")
+    for status in statuses:
+        if status.state == IngestQueue.FAILED:
+            st.error(f"Failed to parse {status.name}: {status.error}")
+    if (session_ledger().version != st.session_state.get('ledger_version')
+            or (st.session_state.get('ingest_active') and not active)):
+        st.rerun()
+
 def choose_period():
     if "temp_date_range" not in st.session_state:
         st.session_state.temp_date_range = (st.session_state.start_date, st.session_state.end_date)
@@ -80,137 +243,113 @@ def choose_period():
             st.success(f"✔️ Confirmed date range: {start} to {end}")
         else:
             st.warning("⚠️ Please select a complete date range")     
-            return pd.DataFrame() 
-    return merge_dfs_in_period(st.session_state.pdf_dfs, st.session_state.start_date, st.session_state.end_date)
+            return False
+    if not len(session_ledger()):
+        st.error("No spreadsheets uploaded yet.") 
+        return False
+    return True
+
+def show_combined_export():
+    # every transaction of the selected period, categorized, as one file
+    ledger = session_ledger()
+    start_date, end_date = st.session_state.start_date, st.session_state.end_date
+    fmt = st.selectbox("Export format", available_formats(), key="export_format")
+    requested = (fmt, start_date, end_date, ledger.version)
+    if st.button("Build export", key="build_export"):
+        st.session_state.export_request = requested
+    if st.session_state.get('export_request') != requested:
+        return
+    unit = st.session_state.view if st.session_state.view in PERIOD_UNITS else 'Month'
+    with instrument.stage('combined_export'):
+        data = combined_export(get_export_cache(), ledger, start_date, end_date, fmt, labels_key(),
+                               cube=load_cube(ledger, start_date, end_date, unit))
+    extension, mime = FORMATS[fmt]
+    st.download_button(f"📥 {fmt}", data=data, file_name=f"transactions_{start_date}_to_{end_date}.{extension}",
+                       mime=mime, key="download_combined")
+
+def load_cube(ledger, start_date, end_date, unit):
+    # period × category × merchant sums, aggregated in sqlite once per ledger version / range / unit
+    with instrument.stage('load_cube'):
+        return get_cube_cache().get(ledger, start_date, end_date, unit, labels_key())
 
-def find_year_near_period_keyword(lines, window=5, year_min=2000, year_max=2100):
+def show_diagnostics():
     """
-    Find the year near the period keyword in the 4 lines
+    Optional sidebar panel with per-stage wall time, call counts and peak memory.
+    Recording runs while the panel is switched on in at least one session; each
+    session sees its own stages plus those of the background parser, which all share.
     """
-    for idx, line in enumerate(lines):
-        if ('period' or 'Period') in line.lower():
-            start = max(0, idx - window)
-            end = min(len(lines), idx + window + 1)
-            for i in range(start, end):
-                years = re.findall(r'\b(20\d{2}|19\d{2})\b', lines[i])
-                for y in years:
-                    y_int = int(y)
-                    if year_min <= y_int <= year_max:
-                        return y_int  
-    return None
-
-def generate_excel_from_pdf(pdf_path):
-    # Step 1: Read all text content from the PDF
-    doc = fitz.open(pdf_path)
-    full_text = ""
-    for page in doc:
-        full_text += page.get_text()
-
-    # Step 2: Split the content into non-empty lines
-    lines = [line.strip() for line in full_text.split('\n') if line.strip()]
-    year = find_year_near_period_keyword(lines)
-    
-    #Step 3:
-    transactions = []
-    i = 0
-    while i < len(lines) - 3:
-        # Check if the line starts with a date (e.g., "Jun 5")
-        if re.match(r'^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}$', lines[i]):
-            trans_date = lines[i]
-            post_date = lines[i+1] if re.match(r'^(Jan|Feb|Mar|...)\s+\d{1,2}$', lines[i+1]) else ""
-            merchant_lines = []
-            amount = None
-
-            j = i + 2
-            while j < len(lines):
-                amt_match = re.match(r'^-?\$?-?\d{1,4}(,\d{3})*\.\d{2}$', lines[j])
-                if amt_match:
-                    amount = float(lines[j].replace('$', '').replace(',', ''))
-                    break
-                else:
-                    merchant_lines.append(lines[j])
-                j += 1
-
-            merchant = ' '.join(merchant_lines)
-            i = j + 1
-            
-            if "THANK" in merchant:
-                continue
-            date_str = trans_date.split()[0] + ' ' + trans_date.split()[1] + ' ' + str(year)
-            transactions.append({
-                "Date": pd.to_datetime(date_str, format="%b %d %Y", errors="coerce"),
-                "Merchant": merchant,
-                "Amount": amount
-            })
-            
-        else:
-            i += 1
-
-    df = pd.DataFrame(transactions)
-    return df
-
-def merge_dfs_in_period(pdf_dfs, start_date, end_date):
-    in_period_dfs = []
-    if pdf_dfs:  
-        for df in pdf_dfs.values():
-            mask = (df['Date'] >= pd.to_datetime(start_date)) & (df['Date'] <= pd.to_datetime(end_date))
-            in_period_dfs.append(df[mask])
-        if not len(in_period_dfs):
-            st.error("No spreadsheets in the selected period.")
-            return pd.DataFrame()
-        return  pd.concat(in_period_dfs, ignore_index=True)
-    else:
-        st.error("No spreadsheets uploaded yet.") 
-        return pd.DataFrame()
-
-def summary_by_unit(df, unit):
-    spend_list = []
-    spend_date_list = []
-    df_list = []
-    
-    df_copy = df.copy()
-    if unit == 'Year':
-        unique_values = sorted(df_copy['Date'].dt.year.dropna().unique())
-        for value in unique_values:
-            sub_df = df_copy[df_copy['Date'].dt.year == value]
-            spend_list.append(sub_df['Amount'].sum())
-            spend_date_list.append(value)
-            df_list.append(sub_df)
-    elif unit == 'Month':
-        df_copy['YearMonth'] = df_copy['Date'].dt.year.astype(str) + '-' + df_copy['Date'].dt.month.astype(str).str.zfill(2)
-        unique_values = sorted(df_copy['YearMonth'].dropna().unique())
-        for value in unique_values:
-            sub_df = df_copy[df_copy['YearMonth'] == value]
-            spend_list.append(sub_df['Amount'].sum())
-            spend_date_list.append(value)    
-            df_list.append(sub_df)
-    elif unit == 'Week':
-        week_index = df_copy['Date'].dt.isocalendar().week
-        year_index = df_copy['Date'].dt.isocalendar().year
-        year_week = year_index.astype(str) + '-W' + week_index.astype(str).str.zfill(2)
-        unique_values = sorted(year_week.dropna().unique())
-        for value in unique_values:
-            mask = (year_week == value)
-            sub_df = df_copy[mask]
-            spend_list.append(sub_df['Amount'].sum())
-            spend_date_list.append(value)    
-            df_list.append(sub_df)
-    return  spend_list, spend_date_list, df_list
+    on = st.toggle("🩺 Diagnostics", key="diagnostics")
+    if not on:
+        return
+    st.checkbox("Track memory (slower)", key="diagnostics_memory",
+                help="Peak MB is left empty for stages that overlapped work on another thread, "
+                     "e.g. the background parser, since the Python allocation peak is process-wide")
+    by_file = st.checkbox("Per file", key="diagnostics_by_file")
+    session = st.session_state.instrument_session
+    st.dataframe(instrument.RECORDER.summary(by_file=by_file, session=session), hide_index=True)
+    col1, col2, col3 = st.columns(3)
+    col1.download_button("JSON", instrument.RECORDER.to_json(session), file_name="diagnostics.json",
+                         mime="application/json")
+    col2.download_button("Trace", instrument.RECORDER.to_chrome_trace(session), file_name="trace.json",
+                         mime="application/json", help="Open in chrome://tracing or ui.perfetto.dev")
+    if col3.button("Clear"):
+        instrument.RECORDER.clear(session)
+    if st.checkbox("Parser throughput", key="diagnostics_parsers"):
+        st.dataframe(PARSERS.throughput(), hide_index=True)
+    if st.checkbox("Parse cache", key="diagnostics_parse_cache"):
+        st.dataframe(parse_cache_report(), hide_index=True)
+    if st.checkbox("Memory use", key="diagnostics_session_memory"):
+        st.dataframe(session_memory_report(), hide_index=True)
+        rss = process_rss_mb()
+        if rss is not None:
+            st.caption(f"Process peak RSS: {rss:,.0f} MB, shared by all sessions")
+
+def parse_cache_report():
+    """
+    Hit / miss counters and size of the parse cache all sessions share, to size its caps.
+    """
+    stats = get_parse_cache().stats()
+    hit_rate = stats['hit_rate']
+    rows = [("Memory hits", stats['memory_hits']), ("Disk hits", stats['disk_hits']), ("Misses", stats['misses']),
+            ("Hit rate", "-" if hit_rate is None else f"{hit_rate:.0%}"),
+            ("Memory", f"{stats['memory_mb']:.1f} / {stats['memory_cap_mb']:.0f} MB, {stats['memory_entries']} statements"),
+            ("Disk", f"{stats['disk_mb']:.1f} / {stats['disk_cap_mb']:.0f} MB"),
+            ("Evictions (memory / disk)", f"{stats['memory_evictions']} / {stats['disk_evictions']}")]
+    return pd.DataFrame(rows, columns=["Parse cache", "Value"]).astype(str)
+
+def session_memory_report():
+    """
+    Memory held by this session's state, plus the caches every session shares,
+    to size how many sessions / ingest workers one server can hold.
+    """
+    items = {f"session: {key}": value for key, value in st.session_state.items()}
+    items["shared: aggregate cubes"] = get_cube_cache()
+    items["shared: export cache"] = get_export_cache()
+    items["shared: parse cache"] = get_parse_cache()
+    return memory_report(items)
 
 class Canvas:
     """
     HomePage controls the layout of the Streamlit dashboard.
     """
     def __init__(self):
-        self.filtered_df = pd.DataFrame()
+        self.has_period = False
 
-        # Ensure uploads directory exists
-        os.makedirs('uploads', exist_ok=True)
         # Initialize session state only once
         if 'uploaded_pdfs' not in st.session_state:
             st.session_state.uploaded_pdfs = []
-        if 'uploaded_excels' not in st.session_state:
-            st.session_state.pdf_dfs = {}
+        if 'pending_pdfs' not in st.session_state:
+            # uploader file id -> (file name, uploaded bytes) not parsed yet
+            st.session_state.pending_pdfs = {}
+        if 'pdf_keys' not in st.session_state:
+            # uploader file id -> parse cache key, so each upload is hashed only once
+            st.session_state.pdf_keys = {}
+        if 'instrument_session' not in st.session_state:
+            # tags this session's diagnostics events
+            st.session_state.instrument_session = uuid.uuid4().hex
+        if 'export_ready' not in st.session_state:
+            # statement ids whose download was prepared
+            st.session_state.export_ready = set()
         if 'view' not in st.session_state:
             st.session_state.view = 'Month'
             
@@ -224,6 +363,13 @@ class Canvas:
     def render(self):
         # Set wide layout
         st.set_page_config(page_title="Bank Dashboard", layout="wide")
+        # recording follows the Diagnostics toggles of the previous runs of all sessions
+        session = st.session_state.instrument_session
+        if st.session_state.get('diagnostics'):
+            instrument.subscribe(session, memory=st.session_state.get('diagnostics_memory', False))
+        else:
+            instrument.unsubscribe(session)
+        instrument.set_session(session)
         left_col, right_col = st.columns([1, 5])
 
         with left_col:
@@ -233,15 +379,21 @@ class Canvas:
             self.render_period_selector()
             self.render_content()
 
+        # drawn last so it includes the stages of this run
+        with left_col:
+            show_diagnostics()
+
     def render_sidebar(self):
         st.header("📁 File Manager")
         st.write("Drag and drop or select PDFs files below:")
         upload_pdf()
         st.subheader("Available Spreadsheets")
         show_csv()
+        st.subheader("Export")
+        show_combined_export()
          
     def render_period_selector(self):
-        self.filtered_df = choose_period()
+        self.has_period = choose_period()
 
     def render_content(self):
         tabs = st.tabs(["Summary", "Favorite Stores", "Line Chart", "Net Spend Table"])
@@ -256,36 +408,46 @@ class Canvas:
             self.render_dimension_selector("net")
             self.render_net_spend_by_category()
 
+    def cube(self):
+        # every tab reads the cached cube of the selected period and current analysis unit
+        if not self.has_period or st.session_state.view not in PERIOD_UNITS:
+            return None
+        return load_cube(session_ledger(), st.session_state.start_date, st.session_state.end_date, st.session_state.view)
+
     def render_summary(self):
         st.subheader(f"Summary")
-        display_overall_summary(self.filtered_df)
+        display_overall_summary(self.cube())
 
     def render_favorite_stores(self):
-        favorite_stores(self.filtered_df)
+        favorite_stores(self.cube())
 
     def render_plot_unit_spending(self):
-        if  not self.filtered_df.empty and st.session_state.view:
-            spend_list, spend_date_list, df_list_in_unit = summary_by_unit(self.filtered_df, st.session_state.view)
-            plot_linear_spending(spend_date_list, spend_list)
+        cube = self.cube()
+        if cube is not None and not cube.empty:
+            plot_linear_spending(cube)
 
     def render_net_spend_by_category(self):
-        if  not self.filtered_df.empty and st.session_state.view:
-            spend_list, spend_date_list, df_list_in_unit = summary_by_unit(self.filtered_df, st.session_state.view)
-            plot_net_spend(df_list_in_unit)
+        cube = self.cube()
+        if cube is not None and not cube.empty:
+            plot_net_spend(cube)
             
     def render_dimension_selector(self, key_prefix):
-        """Renders the Year/Month/Week analysis dimension buttons."""
+        """Renders the Year/Quarter/Month/Week/Day analysis dimension buttons."""
         st.subheader("📊 Analysis Dimension")
-        c1, c2, c3 = st.columns(3)
+        c1, c2, c3, c4, c5 = st.columns(5)
         if c1.button("📅 Year", key=f"{key_prefix}_year"):
             st.session_state.view = 'Year'
-        if c2.button("🗓️ Month", key=f"{key_prefix}_month"):
+        if c2.button("🗂️ Quarter", key=f"{key_prefix}_quarter"):
+            st.session_state.view = 'Quarter'
+        if c3.button("🗓️ Month", key=f"{key_prefix}_month"):
             st.session_state.view = 'Month'
-        if c3.button("📆 Week", key=f"{key_prefix}_week"):
+        if c4.button("📆 Week", key=f"{key_prefix}_week"):
             st.session_state.view = 'Week'
+        if c5.button("📍 Day", key=f"{key_prefix}_day"):
+            st.session_state.view = 'Day'
         
         unit = st.session_state.view
-        if not(unit == 'Year' or unit == 'Month' or unit == 'Week'):
+        if unit not in PERIOD_UNITS:
             st.info('Please select a valid analysis dimension') 
         
 # main.py usage:
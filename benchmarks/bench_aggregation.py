@@ -0,0 +1,146 @@
+"""
+Benchmark for period aggregation on a synthetic multi-year ledger.
+
+Stores the rows in a sqlite Ledger as monthly statements and times, for each
+analysis unit, the dashboard's path to the net spend table: build_cube
+(Ledger.aggregate) plus AggregateCube.period_category_pivot, against the old
+per-period loop (summary_by_unit + per-slice categorization in plot_net_spend).
+With --ledger, adding one more statement is timed too: the incremental cube
+update of CubeCache against rebuilding the cube from scratch.
+
+Usage:
+    python benchmarks/bench_aggregation.py [--rows 1000000] [--years 10] [--legacy-rows 100000] [--ledger]
+
+The legacy loop is quadratic in periods x rows, so it runs on --legacy-rows
+(0 to skip) and its time is also shown scaled to --rows.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from view import category_cfg, get_categorizer
+from aggregates import CubeCache, build_cube
+from ledger import Ledger
+from frames import compact_transactions, memory_report
+
+
+def synthetic_ledger(rows, years, seed=0):
+    rng = np.random.default_rng(seed)
+    keywords = [kw for patterns in category_cfg.categories.values() for kw in patterns]
+    merchants = np.array([f"{rng.choice(keywords)} #{i:04d}" for i in range(200)] +
+                         [f"LOCAL SHOP {i}" for i in range(100)])
+    start = pd.Timestamp('2015-01-01').value
+    span = pd.Timedelta(days=365 * years).value
+    return pd.DataFrame({
+        'Date': pd.to_datetime(np.sort(rng.integers(start, start + span, rows))).normalize(),
+        'Merchant': merchants[rng.integers(0, len(merchants), rows)],
+        'Amount': np.round(rng.gamma(2.0, 30.0, rows) * rng.choice([1, -1], rows, p=[0.95, 0.05]), 2),
+    })
+
+
+def legacy_match_category(df, category_patterns):
+    df_copy = df.copy()
+    df_copy['Category'] = 'Other'
+    for cat, patterns in category_patterns.items():
+        regex = re.compile('|'.join(patterns), re.IGNORECASE)
+        mask = df_copy['Merchant'].astype(str).str.contains(regex)
+        df_copy.loc[mask, 'Category'] = cat
+    return df_copy
+
+
+def legacy_summary(df, unit):
+    # summary_by_unit + plot_net_spend as they were before period_category_pivot
+    df_copy = df.copy()
+    if unit == 'Year':
+        keys = df_copy['Date'].dt.year
+    elif unit == 'Month':
+        keys = df_copy['Date'].dt.year.astype(str) + '-' + df_copy['Date'].dt.month.astype(str).str.zfill(2)
+    else:
+        iso = df_copy['Date'].dt.isocalendar()
+        keys = iso.year.astype(str) + '-W' + iso.week.astype(str).str.zfill(2)
+    matrix = []
+    for value in sorted(keys.dropna().unique()):
+        sub_df = df_copy[keys == value]
+        matrix.append(legacy_match_category(sub_df, category_cfg.categories).groupby('Category')['Amount'].sum())
+    return pd.DataFrame(matrix).fillna(0)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def store_monthly(ledger, df):
+    # one statement per month, as uploads would add them
+    categorizer = get_categorizer(category_cfg)
+    months = df['Date'].dt.to_period('M')
+    start = time.perf_counter()
+    for month, statement in df.groupby(months):
+        ledger.add_statement(f"{month}.pdf", str(month), statement, categorizer=categorizer)
+    print(f"Ledger: {len(ledger):,} rows stored in {time.perf_counter() - start:.1f}s")
+
+
+def bench_incremental(df):
+    categorizer = get_categorizer(category_cfg)
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = Ledger(os.path.join(tmp, 'ledger.db'))
+        months = df['Date'].dt.to_period('M')
+        last = months.max()
+        print()
+        store_monthly(ledger, df[months < last])
+
+        first_day, last_day = df['Date'].min(), df['Date'].max()
+        cache = CubeCache()
+        for unit in ['Year', 'Quarter', 'Month', 'Week', 'Day']:
+            cache.get(ledger, first_day, last_day, unit)
+        ledger.add_statement(f"{last}.pdf", str(last), df[months == last], categorizer=categorizer)
+        for unit in ['Year', 'Quarter', 'Month', 'Week', 'Day']:
+            incremental = timed(lambda: cache.get(ledger, first_day, last_day, unit))
+            full = timed(lambda: build_cube(ledger, first_day, last_day, unit))
+            print(f"{unit:<8} add one statement: incremental cube {incremental:7.3f}s   full rebuild {full:7.3f}s")
+        ledger.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--legacy-rows', type=int, default=100_000)
+    parser.add_argument('--ledger', action='store_true', help='also time incremental cube updates on a sqlite ledger')
+    args = parser.parse_args()
+
+    df = synthetic_ledger(args.rows, args.years)
+    small = synthetic_ledger(args.legacy_rows, args.years) if args.legacy_rows else None
+    print(f"{args.rows:,} rows over {args.years} years")
+    print(memory_report({'object / float64 frame': df, 'compact frame': compact_transactions(df)})
+          .to_string(index=False))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = Ledger(os.path.join(tmp, 'ledger.db'))
+        store_monthly(ledger, df)
+        first_day, last_day = df['Date'].min(), df['Date'].max()
+        for unit in ['Year', 'Quarter', 'Month', 'Week', 'Day']:
+            seconds = timed(lambda: build_cube(ledger, first_day, last_day, unit).period_category_pivot())
+            line = f"{unit:<8} cube + pivot {seconds:8.3f}s"
+            if small is not None and unit in ('Year', 'Month', 'Week'):
+                legacy = timed(lambda: legacy_summary(small, unit))
+                scaled = legacy * args.rows / args.legacy_rows
+                line += f"   legacy {legacy:8.3f}s on {args.legacy_rows:,} rows (~{scaled:.1f}s scaled)"
+            print(line)
+        ledger.close()
+
+    if args.ledger:
+        bench_incremental(df)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Microbenchmark for line fingerprinting.
+
+Compares the original per-line regex chain with LineClassifier.classify
+(one dispatch per line) and checks that both produce the same labels.
+
+Usage:
+    python benchmarks/bench_fingerprint.py [--lines 200000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from general_pdf_extrract import LINE_CLASSIFIER
+
+
+def legacy_fingerprint(line):
+    # The pre-LineClassifier implementation, kept here as the baseline
+    line = line.strip()
+    if re.fullmatch(r'-?\$?[\d,]+\.\d{2}', line):
+        return ('AMOUNT')
+    if re.fullmatch(r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}', line, re.IGNORECASE):
+        return ('DATE')
+    if re.fullmatch(r'\d{10,}', line):
+        return ('ID_NUMBER')
+    if r"thank"  in line.lower() or r"payment" in line.lower():
+        return ('THANK_YOU')
+    return ('TEXT')
+
+
+def sample_lines(n, seed=0):
+    rng = random.Random(seed)
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    merchants = ['STARBUCKS #1234 VANCOUVER BC', 'REAL CDN SUPERSTORE #1523', 'AMZN Mktp CA*2K4L',
+                 'UBER CANADA/UBERTRIP TORONTO', 'PAYMENT - THANK YOU', 'Interest charged on purchases']
+    lines = []
+    while len(lines) < n:
+        day = f"{rng.choice(months)} {rng.randint(1, 28)}"
+        lines.extend([day, day, rng.choice(merchants), str(rng.randint(10**10, 10**12)),
+                      f"${rng.randint(1, 2000):,}.{rng.randint(0, 99):02d}"])
+    return lines[:n]
+
+
+def best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    lines = sample_lines(args.lines)
+    expected = [legacy_fingerprint(line) for line in lines]
+    assert [LINE_CLASSIFIER.classify(line) for line in lines] == expected
+    assert LINE_CLASSIFIER.classify_batch(lines) == expected
+
+    classify = LINE_CLASSIFIER.classify
+    cases = [
+        ('legacy get_line_fingerprint', lambda: [legacy_fingerprint(line) for line in lines]),
+        ('LineClassifier.classify', lambda: [classify(line) for line in lines]),
+    ]
+    baseline = None
+    for name, fn in cases:
+        seconds = best_time(fn, args.repeat)
+        rate = len(lines) / seconds
+        baseline = baseline or rate
+        print(f"{name:<32} {rate:>14,.0f} lines/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
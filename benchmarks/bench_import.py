@@ -0,0 +1,110 @@
+"""
+Cold import time of the app's modules, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter (best of --repeat runs) and its
+cumulative import time compared with a budget; the script exits with status 1
+if any module goes over its budget or pulls in a heavy library it should only
+load on first use.
+
+Usage:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget view=400 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative cold import budgets in milliseconds
+BUDGETS_MS = {
+    'general_pdf_extrract': 200,   # numpy only
+    'category': 50,
+    'parse_cache': 200,
+    'ingest': 250,
+    'ledger': 800,                 # pandas
+    'view': 1200,                  # pandas + streamlit
+    'app': 1200,
+}
+
+# Libraries a module must not import at load time
+MUST_NOT_IMPORT = {
+    'general_pdf_extrract': ['pandas', 'fitz', 'pydeck', 'matplotlib'],
+    'category': ['pandas', 'numpy'],
+    'parse_cache': ['pandas', 'fitz'],
+    'ingest': ['pandas', 'fitz'],
+    'view': ['matplotlib', 'fitz'],
+    'app': ['matplotlib', 'fitz', 'pydeck'],
+}
+
+
+def import_times(module):
+    """
+    Imports `module` in a fresh interpreter.
+    :return: {imported module name: cumulative microseconds}
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+
+def measure(module, repeat):
+    best = None
+    for _ in range(repeat):
+        times = import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS_MS), help='modules to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='best-of runs per module')
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help='override a budget, e.g. view=400')
+    parser.add_argument('--top', type=int, default=0, help='also list the N slowest imports of each module')
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        name, ms = item.split('=')
+        budgets[name] = float(ms)
+
+    failures = []
+    print(f"{'module':<22}{'ms':>9}{'budget':>9}")
+    for module in args.modules:
+        times = measure(module, args.repeat)
+        ms = times[module] / 1000
+        budget = budgets.get(module)
+        over = budget is not None and ms > budget
+        heavy = [lib for lib in MUST_NOT_IMPORT.get(module, []) if lib in times]
+        status = ('OVER BUDGET ' if over else '') + (f"imports {', '.join(heavy)}" if heavy else '')
+        print(f"{module:<22}{ms:>9.1f}{budget if budget is not None else '-':>9}  {status}")
+        if over:
+            failures.append(f"{module}: {ms:.0f}ms > {budget}ms")
+        if heavy:
+            failures.append(f"{module}: eagerly imports {', '.join(heavy)}")
+        if args.top:
+            slowest = sorted(((us, name) for name, us in times.items() if name != module and '.' not in name),
+                             reverse=True)[:args.top]
+            for us, name in slowest:
+                print(f"    {name:<30}{us / 1000:>9.1f}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
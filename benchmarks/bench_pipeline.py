@@ -0,0 +1,195 @@
+"""
+Stage-by-stage benchmark of the extraction pipeline on synthetic statements.
+
+Times each stage separately, for every layout in synthetic.LAYOUTS and every size:
+
+    pdf_text        fitz text extraction (only with --pdf)
+    year            find_statement_year_and_span
+    fingerprint     LINE_CLASSIFIER.classify_batch
+    merge           merge_consecutive_text_lines
+    discovery       encode_fingerprints + discover_pattern_from_codes
+    extraction      find_pattern_matches + building the DataFrame
+    categorize      Categorizer.categorize of the merchants, as Ledger.add_statement
+                    runs it (cold categorizer)
+    fast_path       parsers.REGISTRY.parse, the issuer's single-pass parser
+                    (header detection, year, extraction) on the whole statement
+
+and fits a scaling exponent per stage (time ~ size^k), flagging k > 1.15 as
+super-linear. Results are saved as JSON so two runs can be compared.
+
+Usage:
+    python benchmarks/bench_pipeline.py -o before.json
+    python benchmarks/bench_pipeline.py -o after.json --sizes 10 1000 100000
+    python benchmarks/bench_pipeline.py --compare before.json after.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import general_pdf_extrract as gpe
+import view
+from frames import compact_transactions
+from parsers import REGISTRY as PARSERS
+from synthetic import LAYOUTS, generate_lines, write_pdf
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+SUPER_LINEAR = 1.15
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _extract_rows(lines, codes, pattern, year, spans):
+    n = len(pattern)
+    rows = [gpe.build_transaction(lines[i : i + n], pattern, year, spans, parse_date=False)
+            for i in gpe.find_pattern_matches(codes, pattern)]
+    df = pd.DataFrame(rows)
+    df['Date'] = pd.to_datetime(df['Date'], format="%b %d %Y", errors='coerce')
+    return compact_transactions(df)
+
+
+def _categorize_cold(df):
+    view._categorizer_cache.clear()
+    return view.get_categorizer(view.category_cfg).categorize(df['Merchant'].astype(str))
+
+
+def bench_one(layout, size, repeat, with_pdf):
+    lines = generate_lines(layout, size)
+    stages = {}
+
+    if with_pdf:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'statement.pdf')
+            write_pdf(lines, path)
+            stages['pdf_text'], pdf_lines = _best_of(lambda: gpe.read_pdf_lines(path), repeat)
+        lines = pdf_lines
+
+    stages['year'], (year, spans) = _best_of(lambda: gpe.find_statement_year_and_span(lines), repeat)
+    stages['fingerprint'], fps = _best_of(lambda: gpe.LINE_CLASSIFIER.classify_batch(lines), repeat)
+    stages['merge'], (merged, merged_fps) = _best_of(lambda: gpe.merge_consecutive_text_lines(lines, fps), repeat)
+
+    def discover():
+        codes = gpe.encode_fingerprints(merged_fps)
+        return codes, gpe.discover_pattern_from_codes(codes)
+    stages['discovery'], (codes, pattern) = _best_of(discover, repeat)
+    stages['extraction'], df = _best_of(lambda: _extract_rows(merged, codes, pattern, year, spans), repeat)
+    stages['categorize'], _ = _best_of(lambda: _categorize_cold(df), repeat)
+    stages['fast_path'], _ = _best_of(lambda: PARSERS.parse(lines), repeat)
+
+    return {'lines': len(lines), 'rows': len(df), 'pattern': list(pattern), 'stages': stages}
+
+
+def scaling_exponents(layout_results):
+    """
+    Least-squares slope of log(seconds) over log(size) per stage, using sizes
+    >= 1000 where fixed overheads no longer dominate (falls back to all sizes).
+    """
+    stages = {}
+    for size, result in layout_results.items():
+        for stage, seconds in result['stages'].items():
+            stages.setdefault(stage, []).append((int(size), seconds))
+
+    exponents = {}
+    for stage, points in stages.items():
+        usable = [(size, seconds) for size, seconds in points if size >= 1000]
+        if len(usable) < 2:
+            usable = points
+        if len(usable) < 2:
+            continue
+        xs = [math.log(size) for size, _ in usable]
+        ys = [math.log(max(seconds, 1e-9)) for _, seconds in usable]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        var = sum((x - mean_x) ** 2 for x in xs)
+        exponents[stage] = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+    return exponents
+
+
+def run(args):
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': args.sizes,
+        'results': {},
+        'scaling': {},
+    }
+    for layout in args.layouts:
+        report['results'][layout] = {}
+        for size in args.sizes:
+            repeat = args.repeat if size < 100000 else 1
+            with_pdf = args.pdf and size <= args.pdf_max
+            result = bench_one(layout, size, repeat, with_pdf)
+            report['results'][layout][str(size)] = result
+            timings = '  '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in result['stages'].items())
+            print(f"{layout:<7}{size:>8} txns {result['lines']:>9} lines  {timings}")
+        report['scaling'][layout] = scaling_exponents(report['results'][layout])
+
+    print("\nScaling exponent per stage (time ~ size^k):")
+    for layout, exponents in report['scaling'].items():
+        flagged = '  '.join(f"{stage}={k:.2f}{' SUPER-LINEAR' if k > SUPER_LINEAR else ''}"
+                            for stage, k in exponents.items())
+        print(f"  {layout:<7}{flagged}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{'layout':<8}{'size':>8}  {'stage':<12}{'old ms':>10}{'new ms':>10}{'ratio':>8}")
+    for layout, sizes in new['results'].items():
+        for size, result in sizes.items():
+            before = old['results'].get(layout, {}).get(size)
+            if before is None:
+                continue
+            for stage, seconds in result['stages'].items():
+                if stage not in before['stages']:
+                    continue
+                ratio = seconds / before['stages'][stage] if before['stages'][stage] else float('inf')
+                marker = '  <-- slower' if ratio > 1.2 else ''
+                print(f"{layout:<8}{size:>8}  {stage:<12}{before['stages'][stage] * 1000:>10.2f}"
+                      f"{seconds * 1000:>10.2f}{ratio:>8.2f}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='transactions per statement')
+    parser.add_argument('--layouts', nargs='+', default=list(LAYOUTS), choices=LAYOUTS)
+    parser.add_argument('--repeat', type=int, default=3, help='best-of repeats (1 for sizes >= 100k)')
+    parser.add_argument('--pdf', action='store_true', help='also render PDFs and time fitz text extraction')
+    parser.add_argument('--pdf-max', type=int, default=10000, help='largest size rendered to PDF')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved runs')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
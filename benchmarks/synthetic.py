@@ -0,0 +1,164 @@
+"""
+Synthetic bank statements for benchmarks.
+
+Produces the text-line stream that fitz would return for a statement, and can
+render it into a real PDF, in three layouts modelled on the statements the app
+is verified against:
+
+- RBC:    transaction date, posting date, description, 23-digit reference, amount
+- CIBC:   transaction date, posting date, description, spend category, amount
+- Rogers: transaction date, posting date, description, city / province, amount
+
+Each layout carries a header with the statement period and due date, a payment
+line, page footers with the statement date, and pages of legal / interest
+disclosure text, so the parser sees the same kinds of noise as on a real
+statement. All transactions fall inside one 30-day statement period.
+
+Usage:
+    python benchmarks/synthetic.py RBC 1000 out.pdf
+"""
+import random
+import sys
+from datetime import date, timedelta
+from itertools import chain
+
+LAYOUTS = ('RBC', 'CIBC', 'Rogers')
+
+MERCHANTS = [
+    'STARBUCKS #{n} VANCOUVER BC', 'REAL CDN SUPERSTORE #{n}', 'AMZN Mktp CA*{n}K4L',
+    'UBER CANADA/UBERTRIP TORONTO', 'SHELL C{n} BURNABY', 'COSTCO WHOLESALE W{n}',
+    'TIM HORTONS #{n}', 'NETFLIX.COM', 'SPOTIFY P{n}', 'LONDON DRUGS {n}',
+    'SAVE ON FOODS #{n}', 'MCDONALD\'S #{n}', 'CANADIAN TIRE #{n}', 'BEST BUY #{n}',
+    'OPENAI *CHATGPT SUBSCR', 'T&T SUPERMARKET #{n}', 'PETRO-CANADA {n}', 'LOCAL CAFE',
+]
+SPEND_CATEGORIES = ['Restaurants', 'Retail and Grocery', 'Transportation', 'Personal and Household Expenses']
+CITIES = ['TORONTO ON', 'VANCOUVER BC', 'CALGARY AB', 'MONTREAL QC', 'OTTAWA ON']
+LEGAL_TEXT = [
+    'Interest rates and charges are calculated on your average daily balance.',
+    'If you pay your full balance by the payment due date you will not be charged interest',
+    'on new purchases. Cash advances accrue interest from the date they are taken.',
+    'Please examine this statement and report any errors within 30 days.',
+    'Rewards points earned this period are shown in your rewards summary.',
+    'Minimum payment warning: paying only the minimum will take longer to pay off.',
+]
+TRANSACTIONS_PER_PAGE = 40
+LEGAL_PAGE_EVERY = 5
+
+
+def _fmt_date(day, layout):
+    if layout == 'RBC':
+        return day.strftime('%b %d').upper()
+    if layout == 'Rogers':
+        return f"{day.strftime('%b')} {day.day}"
+    return day.strftime('%b %d')
+
+
+def generate_lines(layout, n_transactions, seed=0, start=date(2024, 1, 7)):
+    """
+    Returns the stripped, non-empty text lines of a synthetic statement.
+
+    :param layout: One of LAYOUTS.
+    :param n_transactions: Number of purchase rows (a payment row is added on top).
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    rng = random.Random(seed)
+    days = 30
+    end = start + timedelta(days=days)
+    due = end + timedelta(days=21)
+
+    lines = [
+        f"STATEMENT FROM {start.strftime('%b %d, %Y').upper()} TO {end.strftime('%b %d, %Y').upper()}",
+        'Statement period',
+        f"{start.strftime('%B %d, %Y')} - {end.strftime('%B %d, %Y')}",
+    ]
+    lines += {
+        'RBC': ['RBC Royal Bank', 'RBC Avion Visa Infinite', 'ACCOUNT NUMBER', '4510 12** **** 3456'],
+        'CIBC': ['CIBC', 'CIBC Dividend Visa Card', 'Your account at a glance', '4500 **** **** 7890'],
+        'Rogers': ['Rogers Bank', 'Rogers World Elite Mastercard', 'Card Number', '5191 23XX XXXX 1234'],
+    }[layout]
+    lines += [
+        'Previous statement balance', f"${rng.randint(100, 3000):,}.{rng.randint(0, 99):02d}",
+        'Credit limit', '$10,000.00',
+        'PAYMENT DUE DATE',
+        due.strftime('%B %d, %Y'),
+        'TRANSACTION DATE', 'POSTING DATE', 'ACTIVITY DESCRIPTION', 'AMOUNT ($)',
+    ]
+
+    payment_at = rng.randrange(n_transactions + 1)
+    page = 1
+    for i in range(n_transactions + 1):
+        day = start + timedelta(days=min(days, i * days // max(1, n_transactions)))
+        posted = day + timedelta(days=rng.randint(0, 3))
+        if i == payment_at:
+            lines += [_fmt_date(day, layout), _fmt_date(posted, layout),
+                      'PAYMENT - THANK YOU / PAIEMENT - MERCI', f"-${rng.randint(100, 3000):,}.00"]
+            continue
+
+        merchant = rng.choice(MERCHANTS).format(n=rng.randint(100, 99999))
+        amount = f"{rng.randint(1, 1500):,}.{rng.randint(0, 99):02d}"
+        lines += [_fmt_date(day, layout), _fmt_date(posted, layout), merchant]
+        if layout == 'RBC':
+            lines += [''.join(rng.choice('0123456789') for _ in range(23)), f"${amount}"]
+        elif layout == 'CIBC':
+            lines += [rng.choice(SPEND_CATEGORIES), amount]
+        else:
+            lines += [rng.choice(CITIES), amount]
+
+        if (i + 1) % TRANSACTIONS_PER_PAGE == 0:
+            lines += [f"Page {page}", f"Statement date {end.strftime('%B %d, %Y')}", 'continued on next page']
+            page += 1
+            if page % LEGAL_PAGE_EVERY == 0:
+                lines += rng.sample(LEGAL_TEXT, len(LEGAL_TEXT))
+                lines += [f"Page {page}", f"Statement date {end.strftime('%B %d, %Y')}"]
+                page += 1
+
+    lines += ['Interest charged on purchases', '$0.00', 'Total account balance', f"${rng.randint(100, 9000):,}.{rng.randint(0, 99):02d}"]
+    lines += LEGAL_TEXT
+    return lines
+
+
+def _page_breaks(lines):
+    # a statement page ends after its footer: "continued on next page", or the
+    # "Statement date" line of a legal page
+    for i, line in enumerate(lines):
+        if line == 'continued on next page' or (
+                line.startswith('Statement date') and lines[i + 1:i + 2] != ['continued on next page']):
+            yield i + 1
+
+
+def write_pdf(lines, path, lines_per_page=60, fontsize=8):
+    """
+    Renders text lines into a PDF at `path`, one text line per line. A new PDF
+    page starts after each statement page footer or every `lines_per_page` lines,
+    so legal / disclosure pages stay pages of their own.
+    """
+    import fitz
+
+    doc = fitz.open()
+    chunks = []
+    start = 0
+    for end in chain(_page_breaks(lines), [len(lines)]):
+        chunks += [lines[offset:min(offset + lines_per_page, end)] for offset in range(start, end, lines_per_page)]
+        start = end
+    for chunk in chunks:
+        page = doc.new_page()
+        y = 36
+        for line in chunk:
+            page.insert_text((36, y), line, fontsize=fontsize)
+            y += fontsize + 4.5
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def generate_pdf(layout, n_transactions, path, seed=0):
+    lines = generate_lines(layout, n_transactions, seed=seed)
+    write_pdf(lines, path)
+    return lines
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print(__doc__)
+        sys.exit(2)
+    generate_pdf(sys.argv[1], int(sys.argv[2]), sys.argv[3])
@@ -1,22 +1,139 @@
+import copy
+import hashlib
 import json
 import os
+import re
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
 
-class MerchantMap:
-    def __init__(self, filepath='merchant_map.json'):
+class JsonStore:
+    """
+    Base for the JSON-backed config files.
+
+    - save() writes to a temp file in the same directory and renames it over the
+      original, so a crash mid-write never leaves a truncated config behind.
+    - batch() groups many edits into a single save, and rolls them back if the
+      block raises.
+    - reload_if_changed() rereads the file only when its mtime/size changed.
+    - version goes up on every edit or reload, so caches built from the data
+      (categorizers, normalizers) can tell when to rebuild.
+
+    Subclasses keep their data in their own attribute and expose it through
+    _get_data / _set_data.
+    """
+    def __init__(self, filepath):
         self.filepath = filepath
-        self.map = {}
+        self.version = 0
+        self._stamp = None
+        self._batch_depth = 0
+        self._dirty = False
+        self._hash = None
+        self._hash_version = None
         self.load()
 
+    def _get_data(self):
+        raise NotImplementedError
+
+    def _set_data(self, data):
+        raise NotImplementedError
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
     def load(self):
-        if os.path.exists(self.filepath):
+        self._stamp = self._file_stamp()
+        if self._stamp is not None:
             with open(self.filepath, 'r', encoding='utf-8') as f:
-                self.map = json.load(f)
+                self._set_data(json.load(f))
         else:
-            self.map = {}
+            self._set_data({})
+        self.version += 1
+
+    def reload_if_changed(self):
+        """
+        Reloads from disk if another process or an editor changed the file.
+        :return: True if the data was reloaded.
+        """
+        if self._batch_depth or self._file_stamp() == self._stamp:
+            return False
+        self.load()
+        return True
 
     def save(self):
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.map, f, ensure_ascii=False, indent=2)
+        if self._batch_depth:
+            self._dirty = True
+            return
+        directory = os.path.dirname(os.path.abspath(self.filepath))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.filepath)}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._get_data(), f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._stamp = self._file_stamp()
+        self._dirty = False
+
+    def _changed(self):
+        self.version += 1
+        self.save()
+
+    def content_hash(self):
+        """
+        SHA-1 of the current data, for keys that must survive a restart (version does not).
+        """
+        if self._hash_version != self.version:
+            payload = json.dumps(self._get_data(), ensure_ascii=False).encode('utf-8')
+            self._hash = hashlib.sha1(payload).hexdigest()
+            self._hash_version = self.version
+        return self._hash
+
+    @contextmanager
+    def batch(self):
+        """
+        Applies every edit inside the block with one save at the end.
+
+        with merchant_map.batch():
+            for variant, standard in rows:
+                merchant_map.add(variant, standard)
+        """
+        if self._batch_depth == 0:
+            snapshot = copy.deepcopy(self._get_data())
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                # Roll back the whole batch, nothing was written yet
+                self._set_data(snapshot)
+                self._dirty = False
+                self.version += 1
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0 and self._dirty:
+            self.save()
+
+
+class MerchantMap(JsonStore):
+    def __init__(self, filepath='merchant_map.json'):
+        self.map = {}
+        super().__init__(filepath)
+
+    def _get_data(self):
+        return self.map
+
+    def _set_data(self, data):
+        self.map = data
 
     def get(self, merchant):
         # 返回标准名，找不到就返回原名
@@ -24,65 +141,176 @@ class MerchantMap:
 
     def add(self, variant, standard):
         self.map[variant] = standard
-        self.save()
+        self._changed()
 
     def remove(self, variant):
         if variant in self.map:
             del self.map[variant]
-            self.save()
+            self._changed()
 
     def update(self, variant, new_standard):
         self.map[variant] = new_standard
-        self.save()
+        self._changed()
 
     def list_all(self):
         return self.map.copy()
 
 
+class MerchantNormalizer:
+    """
+    Resolves raw merchant strings from statements to the standard names of a MerchantMap.
+
+    Every variant in the map is split into tokens and stored in a token trie. A raw
+    merchant resolves to a variant when the variant's tokens appear as a run of whole
+    tokens in it, so 'REAL CDN SUPERSTORE #1523 SURREY' hits the 'REAL CDN' variant.
+    The earliest run wins, and at the same position the longest one.
+    Merchants with no known variant keep their (upper-cased) name minus store numbers.
+
+    Results are memoized per raw string in a bounded LRU cache.
+    """
+    _TOKEN_RE = re.compile(r"[A-Z0-9&']+")
+    # Words with three or more digits are store / terminal numbers
+    _STORE_NUMBER_RE = re.compile(r'.*\d.*\d.*\d')
 
+    def __init__(self, mapping, maxsize=65536):
+        self.trie = {}
+        for variant, standard in mapping.items():
+            node = self.trie
+            for token in self.tokenize(variant):
+                node = node.setdefault(token, {})
+            if node is not self.trie:
+                node[None] = standard
+        self.normalize = lru_cache(maxsize=maxsize)(self._normalize)
 
-class CategoryConfig:
+    @classmethod
+    def tokenize(cls, text):
+        return cls._TOKEN_RE.findall(text.upper())
+
+    def _normalize(self, merchant):
+        tokens = self.tokenize(merchant)
+        for start in range(len(tokens)):
+            node = self.trie
+            standard = None
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                standard = node.get(None, standard)
+            if standard is not None:
+                return standard
+
+        # Unknown merchant: drop store numbers, keep the rest of the name as printed
+        kept = [word for word in merchant.upper().split() if not self._STORE_NUMBER_RE.match(word)]
+        return ' '.join(kept) if kept else merchant.strip()
+
+    def normalize_column(self, merchants):
+        """
+        Normalizes a Series of raw merchant names.
+
+        Each distinct raw string is resolved once; the result is a categorical
+        Series, so later groupbys work on a few hundred codes instead of raw strings.
+        """
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(merchants.astype(str))
+        names, name_codes = np.unique([self.normalize(raw) for raw in uniques], return_inverse=True)
+        row_codes = name_codes.reshape(-1)[codes] if len(codes) else codes
+        return pd.Series(pd.Categorical.from_codes(row_codes, categories=names),
+                         index=merchants.index, name=merchants.name)
+
+
+class CategoryConfig(JsonStore):
     def __init__(self, filepath='category.json'):
-        self.filepath = filepath
         self.categories = {}
-        self.load()
+        super().__init__(filepath)
 
-    def load(self):
-        if os.path.exists(self.filepath):
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                self.categories = json.load(f)
-        else:
-            self.categories = {}
+    def _get_data(self):
+        return self.categories
 
-    def save(self):
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.categories, f, ensure_ascii=False, indent=2)
+    def _set_data(self, data):
+        self.categories = data
 
     def add_keyword(self, category, keyword):
         if category not in self.categories:
             self.categories[category] = []
         if keyword not in self.categories[category]:
             self.categories[category].append(keyword)
-            self.save()
+            self._changed()
 
     def remove_keyword(self, category, keyword):
         if category in self.categories and keyword in self.categories[category]:
             self.categories[category].remove(keyword)
-            self.save()
+            self._changed()
 
     def add_category(self, category):
         if category not in self.categories:
             self.categories[category] = []
-            self.save()
+            self._changed()
 
     def remove_category(self, category):
         if category in self.categories:
             del self.categories[category]
-            self.save()
+            self._changed()
 
     def list_all(self):
         return self.categories.copy()
 
+class Categorizer:
+    """
+    Assigns a category to merchant strings, built once from CategoryConfig.categories.
+
+    All categories are compiled into a single regex: one lookahead branch per
+    category, tried in precedence order, so the first category (in `precedence`)
+    with a matching keyword wins. By default precedence is the order of the
+    categories in the config file. Keywords are regexes, matched case-insensitively
+    anywhere in the merchant string, and categories without keywords never match.
+
+    Every distinct merchant string is classified only once and the answer memoized.
+    """
+    def __init__(self, categories, precedence=None, default='Other'):
+        order = list(precedence) if precedence is not None else []
+        order += [cat for cat in categories if cat not in order]
+        self.order = [cat for cat in order if categories.get(cat)]
+        self.default = default
+
+        branches = [
+            f"(?=.*?(?:{'|'.join(categories[cat])}))(?P<c{i}>)"
+            for i, cat in enumerate(self.order)
+        ]
+        self._regex = re.compile('|'.join(branches), re.IGNORECASE | re.DOTALL) if branches else None
+        self._memo = {}
+
+    def classify(self, merchant):
+        category = self._memo.get(merchant)
+        if category is None:
+            match = self._regex.match(merchant) if self._regex is not None else None
+            category = self.order[int(match.lastgroup[1:])] if match else self.default
+            self._memo[merchant] = category
+        return category
+
+    def categorize(self, merchants):
+        """
+        Categorizes a Series of merchants.
+
+        :param merchants: pd.Series of merchant names.
+        :return: A categorical pd.Series aligned with `merchants`.
+        """
+        import numpy as np
+        import pandas as pd
+
+        if isinstance(merchants.dtype, pd.CategoricalDtype) and not merchants.isna().any():
+            codes, uniques = merchants.cat.codes.to_numpy(), merchants.cat.categories.astype(str)
+        else:
+            codes, uniques = pd.factorize(merchants.astype(str))
+        labels = self.order + [self.default]
+        index = {label: i for i, label in enumerate(labels)}
+        unique_codes = np.array([index[self.classify(merchant)] for merchant in uniques], dtype=np.int64)
+        # Map the per-merchant answers back onto every row
+        row_codes = unique_codes[codes]
+        return pd.Series(pd.Categorical.from_codes(row_codes, categories=labels),
+                         index=merchants.index, name='Category')
+
 # # 商户标准化
 # merchant_map = MerchantMap('merchant_map.json')
 # merchant_map.add('RCSS', 'SUPERSTORE')
@@ -0,0 +1,147 @@
+"""
+Headless batch conversion of bank statements, no browser needed.
+
+    python cli.py statements/ -o transactions.parquet
+    python cli.py "archive/**/*.pdf" -o transactions.csv --workers 8 --normalize
+
+Every PDF is parsed in parallel; all transactions go to one combined CSV or
+Parquet file (chosen by the output extension) with a Source column, and a
+per-file report (rows, seconds, parser, detected pattern, error) is written next to it;
+the throughput of each parser (fast path or dynamic) is printed at the end.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import pandas as pd
+from ingest import ingest_pdfs
+from parsers import REGISTRY as PARSERS
+from parse_cache import ParseCache
+from dedup import DedupIndex, transaction_keys
+from frames import amount_cents, export_transactions
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def find_pdfs(inputs):
+    """
+    Expands directories (all PDFs below them), glob patterns and plain paths,
+    keeping the first occurrence of each file.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', '*.pdf'), recursive=True)
+            matches += glob.glob(os.path.join(item, '**', '*.PDF'), recursive=True)
+        elif glob.has_magic(item):
+            matches = glob.glob(item, recursive=True)
+        else:
+            matches = [item]
+        paths.extend(sorted(matches))
+    return list(dict.fromkeys(paths))
+
+
+def write_table(df, path):
+    if path.lower().endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='PDF files, directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True, help='combined output file (.csv or .parquet)')
+    parser.add_argument('--report', help='per-file report (default: <output stem>.report.csv)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--cache', metavar='DIR', help='reuse / fill a parse cache directory')
+    parser.add_argument('--normalize', action='store_true',
+                        help='normalize merchants and add a Category column from the JSON configs')
+    parser.add_argument('--templates', metavar='FILE',
+                        help='learned layout templates (JSON), so repeat layouts skip pattern discovery')
+    parser.add_argument('--dedup', action='store_true',
+                        help='drop transactions already seen in another statement of the same card')
+    parser.add_argument('--merchant-map', default=os.path.join(HERE, 'merchant_map.json'))
+    parser.add_argument('--categories', default=os.path.join(HERE, 'category.json'))
+    args = parser.parse_args(argv)
+
+    paths = find_pdfs(args.inputs)
+    if not paths:
+        print("No PDF files found.", file=sys.stderr)
+        return 1
+
+    normalizer = categorizer = None
+    if args.normalize:
+        from category import MerchantMap, CategoryConfig, MerchantNormalizer, Categorizer
+        normalizer = MerchantNormalizer(MerchantMap(args.merchant_map).map)
+        categorizer = Categorizer(CategoryConfig(args.categories).categories)
+
+    cache = ParseCache(args.cache) if args.cache else None
+    templates = None
+    if args.templates:
+        from templates import TemplateRegistry
+        templates = TemplateRegistry(args.templates)
+    start = time.perf_counter()
+    results = ingest_pdfs(paths, max_workers=args.workers, cache=cache, normalizer=normalizer,
+                          templates=templates)
+    elapsed = time.perf_counter() - start
+
+    frames = []
+    report = []
+    index = DedupIndex() if args.dedup else None
+    for result in results:
+        rows = duplicates = 0
+        if result.df is not None and not result.df.empty:
+            df = result.df
+            if index is not None:
+                df = df.dropna(subset=['Date'])
+                keys = transaction_keys(df['Date'].dt.strftime('%Y-%m-%d'),
+                                        amount_cents(df),
+                                        df['Merchant'].astype(str),
+                                        result.df.attrs.get('account'))
+                new = index.new_rows(keys)
+                index.add(key for key, keep in zip(keys, new) if keep)
+                duplicates = len(keys) - sum(new)
+                df = df[new]
+            df = df.assign(Source=os.path.basename(result.source))
+            if categorizer is not None:
+                df['Category'] = categorizer.categorize(df['Merchant'])
+            frames.append(df)
+            rows = len(df)
+        report.append({
+            'File': result.source,
+            'Rows': rows,
+            'Duplicates': duplicates,
+            'Lines': result.lines,
+            'Seconds': None if result.seconds is None else round(result.seconds, 4),
+            'Parser': result.parser,
+            'Pattern': ' '.join(result.pattern) if result.pattern else None,
+            'Error': result.error,
+        })
+
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Date', 'Merchant', 'Cents', 'Source'])
+    write_table(export_transactions(combined), args.output)
+    report_path = args.report or f"{os.path.splitext(args.output)[0]}.report.csv"
+    report_df = pd.DataFrame(report).astype({'Lines': 'Int64'})
+    write_table(report_df, report_path)
+
+    failed = int(report_df['Error'].notna().sum())
+    # only parsed files have a parse time and a line count; cache hits have neither
+    parsed = int(report_df['Seconds'].notna().sum())
+    cache_hits = len(report_df) - failed - parsed
+    total_lines = int(report_df['Lines'].fillna(0).sum())
+    print(f"{len(paths)} files ({failed} failed), {len(combined)} transactions -> {args.output}"
+          + (f", {int(report_df['Duplicates'].sum())} duplicates dropped" if args.dedup else ''))
+    print(f"Report -> {report_path}")
+    print(f"{elapsed:.2f}s: {len(paths) / elapsed:.1f} files/sec"
+          + (f", {total_lines / elapsed:,.0f} lines/sec ({parsed} parsed)" if parsed else '')
+          + (f", {cache_hits} from the parse cache" if cache_hits else ''))
+    for row in PARSERS.throughput().to_dict('records'):
+        print(f"  {row['Parser']:<10}{row['Statements']:>5} files {row['Lines/s'] or 0:>12,} lines/sec "
+              f"{row['Rows/s'] or 0:>10,} rows/sec")
+    return 0 if failed < len(paths) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import re
+
+_NON_ALNUM_RE = re.compile(r'[^A-Z0-9]+')
+
+
+def dedup_merchant(raw):
+    """
+    Merchant text reduced to upper-case letters and digits, so the same charge
+    printed with different spacing or punctuation by two exports still matches.
+    Independent of the merchant map, so keys stay stable when the map is edited.
+    """
+    return _NON_ALNUM_RE.sub('', str(raw).upper())
+
+
+def transaction_keys(dates, cents, merchants, account=None):
+    """
+    Dedup keys of one statement's transactions: "date|cents|merchant|account|n".
+
+    `n` numbers repeats of the same (date, cents, merchant) inside the statement,
+    so two identical coffees on one day are both kept, while the same pair seen
+    again in an overlapping statement matches the first two keys.
+
+    :param dates: ISO date strings.
+    :param cents: Integer amounts in cents.
+    :param merchants: Raw merchant names.
+    :param account: Card / account identifier of the statement, '' or None if unknown.
+    :return: A list of keys aligned with the inputs.
+    """
+    account = account or ''
+    normalized = {}
+    seen = {}
+    keys = []
+    for day, amount, merchant in zip(dates, cents, merchants):
+        name = normalized.get(merchant)
+        if name is None:
+            name = normalized[merchant] = dedup_merchant(merchant)
+        base = f"{day}|{amount}|{name}|{account}"
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append(f"{base}|{n}")
+    return keys
+
+
+class DedupIndex:
+    """
+    Hash set of transaction keys across all loaded statements, O(1) per row.
+    """
+    def __init__(self, keys=()):
+        self._keys = set(keys)
+
+    def new_rows(self, keys):
+        """
+        :return: A list of booleans, True for keys not seen before.
+        """
+        known = self._keys
+        return [key not in known for key in keys]
+
+    def add(self, keys):
+        self._keys.update(keys)
+
+    def discard(self, keys):
+        self._keys.difference_update(keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
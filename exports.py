@@ -0,0 +1,190 @@
+"""
+Downloads: single statements and a combined export of a whole period.
+
+Nothing is serialized until a download is asked for. The bytes are then kept
+in an ExportCache keyed on what they were built from (statement, content key,
+merchant map + category config, format), so later reruns reuse them and an
+edit to the configs or a re-parse builds them again.
+
+The combined export reads the ledger in chunks (Ledger.iter_transactions) and
+writes each one out before reading the next, so a long history is never held
+as one DataFrame (the Excel engines still keep the sheet cells until the file
+is closed). Excel is only offered when xlsxwriter or openpyxl is installed.
+"""
+import importlib.util
+import io
+import tempfile
+import threading
+from collections import OrderedDict
+import pandas as pd
+from frames import export_transactions
+
+# format -> (file extension, MIME type)
+FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# one sheet holds at most 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+
+# column types of the combined Parquet export, fixed so every chunk matches
+_PARQUET_COLUMNS = [('Date', 'timestamp'), ('Merchant', 'string'), ('Category', 'string'),
+                    ('Amount', 'float64'), ('Source', 'string')]
+
+
+def excel_engine():
+    """
+    :return: 'xlsxwriter', 'openpyxl', or None if neither is installed.
+    """
+    for engine in ('xlsxwriter', 'openpyxl'):
+        if importlib.util.find_spec(engine) is not None:
+            return engine
+    return None
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != 'Excel' or excel_engine() is not None]
+
+
+def _excel_writer(out):
+    engine = excel_engine()
+    if engine is None:
+        raise RuntimeError("Excel export needs xlsxwriter or openpyxl: pip install xlsxwriter")
+    # no xlsxwriter constant_memory: pandas writes cells column by column, which it does not support
+    return pd.ExcelWriter(out, engine=engine)
+
+
+def frame_bytes(df, fmt):
+    """
+    Serializes one transaction frame (compact or export form) in `fmt`, one of FORMATS.
+    """
+    df = export_transactions(df)
+    if fmt == 'CSV':
+        return df.to_csv(index=False).encode('utf-8')
+    buffer = io.BytesIO()
+    if fmt == 'Parquet':
+        df.to_parquet(buffer, index=False)
+    elif fmt == 'Excel':
+        with _excel_writer(buffer) as writer:
+            df.to_excel(writer, sheet_name='Transactions', index=False)
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {list(FORMATS)}")
+    return buffer.getvalue()
+
+
+class ExportCache:
+    """
+    LRU of serialized exports, bounded by their total size. An export larger
+    than the whole budget is returned but not kept.
+    """
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        :param build: Called on a miss, returns the bytes for `key`.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = build()
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = data
+                    self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def nbytes(self):
+        return self._size
+
+
+def statement_export(cache, ledger, statement_id, content_key, labels_key, fmt='CSV'):
+    """
+    The download of one stored statement, built on first use.
+    :param labels_key: Identifies the merchant map + category config the ledger labels come from.
+    """
+    key = ('statement', ledger.path, statement_id, content_key, labels_key, fmt)
+    return cache.get(key, lambda: frame_bytes(ledger.statement_frame(statement_id), fmt))
+
+
+def write_combined(ledger, start_date, end_date, fmt, out, cube=None, chunk_rows=50000):
+    """
+    Writes every transaction of [start_date, end_date], with normalized merchant,
+    category and source statement, to the binary file `out`, chunk by chunk.
+
+    :param fmt: One of FORMATS.
+    :param cube: Optional AggregateCube of the same range; an Excel export then also
+                 gets "By category" and "By period" summary sheets.
+    """
+    chunks = (export_transactions(chunk) for chunk in ledger.iter_transactions(start_date, end_date, chunk_rows))
+    if fmt == 'CSV':
+        header = True
+        for chunk in chunks:
+            out.write(chunk.to_csv(index=False, header=header).encode('utf-8'))
+            header = False
+        if header:
+            out.write((','.join(name for name, _ in _PARQUET_COLUMNS) + '\n').encode('utf-8'))
+    elif fmt == 'Parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {'timestamp': pa.timestamp('ns'), 'string': pa.string(), 'float64': pa.float64()}
+        schema = pa.schema([(name, types[kind]) for name, kind in _PARQUET_COLUMNS])
+        with pq.ParquetWriter(out, schema) as writer:
+            for chunk in chunks:
+                chunk = chunk.astype({'Merchant': str, 'Category': str, 'Source': str})
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    elif fmt == 'Excel':
+        with _excel_writer(out) as writer:
+            sheets, row = 1, 0
+            for chunk in chunks:
+                if row + len(chunk) > EXCEL_MAX_ROWS:
+                    sheets, row = sheets + 1, 0
+                sheet = 'Transactions' if sheets == 1 else f"Transactions {sheets}"
+                # the header takes the first row of each sheet
+                chunk.to_excel(writer, sheet_name=sheet, startrow=row + 1 if row else 0, header=not row, index=False)
+                row += len(chunk)
+            if row == 0:
+                pd.DataFrame(columns=[name for name, _ in _PARQUET_COLUMNS]).to_excel(
+                    writer, sheet_name='Transactions', index=False)
+            if cube is not None and not cube.empty:
+                cube.category_totals().sort_values(ascending=False).to_frame().to_excel(
+                    writer, sheet_name='By category')
+                cube.period_category_pivot().to_excel(writer, sheet_name=f"By {cube.unit.lower()}")
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {list(FORMATS)}")
+
+
+def combined_export(cache, ledger, start_date, end_date, fmt, labels_key, cube=None):
+    """
+    The bytes of write_combined, cached per ledger version, config and range.
+    The export is first written to a spooled temporary file (on disk past 16 MB).
+    """
+    key = ('combined', ledger.path, ledger.version, labels_key, str(start_date), str(end_date), fmt)
+
+    def build():
+        with tempfile.SpooledTemporaryFile(max_size=16 * 2**20) as out:
+            write_combined(ledger, start_date, end_date, fmt, out, cube=cube)
+            out.seek(0)
+            return out.read()
+    return cache.get(key, build)
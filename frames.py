@@ -0,0 +1,141 @@
+"""
+Compact in-memory schema for transaction frames.
+
+    Date      datetime64[ns], sorted once when the frame is built (NaT last)
+    Merchant  category
+    Category  category (when present)
+    Cents     int64 amount in cents
+
+Merchant and category names repeat a lot, so as categoricals each row costs a
+small integer code instead of a Python string object; integer cents are exact
+and half the size of an object column. Exports (CSV, downloads) go through
+export_transactions, which brings back the dollar Amount column.
+"""
+import sys
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ('Merchant', 'Category', 'Period', 'Source')
+
+
+def to_cents(amounts):
+    """
+    :param amounts: Dollar amounts (floats).
+    :return: int64 Series of cents.
+    """
+    return (pd.Series(amounts, copy=False) * 100).round().astype('int64')
+
+
+def amount_cents(df):
+    """
+    The amounts of a transaction frame in cents, from Cents or a legacy dollar Amount column.
+    """
+    if 'Cents' in df:
+        return df['Cents']
+    return to_cents(df['Amount'])
+
+
+def compact_transactions(df):
+    """
+    Converts a transaction frame to the compact schema, see the module docstring.
+    Columns already in their compact dtype are not copied.
+    """
+    if df.empty and 'Date' not in df:
+        return df
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        if name == 'Amount':
+            name, column = 'Cents', to_cents(column)
+        elif name == 'Date' and column.dtype == object:
+            column = pd.to_datetime(column)
+        elif name in CATEGORICAL_COLUMNS and column.dtype != 'category':
+            column = column.astype('category')
+        columns[name] = column
+    compact = pd.DataFrame(columns, copy=False)
+    compact.attrs = dict(df.attrs)
+    return sort_by_date(compact)
+
+
+def sort_by_date(df):
+    """
+    Stable sort on Date, skipped when the frame is already in order (e.g. read back with ORDER BY date).
+    """
+    if 'Date' not in df or df['Date'].is_monotonic_increasing:
+        return df
+    return df.sort_values('Date', kind='stable', na_position='last', ignore_index=True)
+
+
+def compact_cells(cells):
+    """
+    Makes the label columns of an aggregate (Period, Category, Merchant) categorical,
+    without categories left over from rows that were filtered out.
+    """
+    for name in CATEGORICAL_COLUMNS:
+        if name not in cells:
+            continue
+        if cells[name].dtype != 'category':
+            cells[name] = cells[name].astype('category')
+        else:
+            cells[name] = cells[name].cat.remove_unused_categories()
+    return cells
+
+
+def export_transactions(df):
+    """
+    A compact frame in export form: dollar Amount instead of Cents, in the original column position.
+    """
+    if 'Cents' not in df:
+        return df
+    columns = {('Amount' if name == 'Cents' else name): (df[name] / 100 if name == 'Cents' else df[name])
+               for name in df.columns}
+    return pd.DataFrame(columns, copy=False)
+
+
+def object_nbytes(obj):
+    """
+    Approximate memory held by one object: deep usage for frames and series,
+    the buffer size for bytes / memoryviews, sys.getsizeof otherwise.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray, str)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(object_nbytes(k) + object_nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sys.getsizeof(obj) + sum(object_nbytes(item) for item in obj)
+    nbytes = getattr(obj, 'nbytes', None)
+    if callable(nbytes):
+        return int(nbytes())
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(obj)
+
+
+def memory_report(items):
+    """
+    :param items: {name: object}, e.g. the entries of one session's state.
+    :return: DataFrame with Item and MB, largest first, plus a Total row.
+    """
+    sizes = [(name, object_nbytes(obj)) for name, obj in items.items()]
+    sizes.sort(key=lambda item: item[1], reverse=True)
+    sizes.append(('Total', sum(size for _, size in sizes)))
+    return pd.DataFrame({'Item': [name for name, _ in sizes],
+                         'MB': [round(size / 2**20, 3) for _, size in sizes]})
+
+
+def process_rss_mb():
+    """
+    Peak resident set size of this process in MB (None where the resource module is unavailable).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
@@ -1,10 +1,16 @@
 import re
-import pandas as pd
-from collections import Counter
+import numpy as np
+from collections import Counter, deque
+from itertools import chain, islice
 from datetime import date
-import fitz
-from pydeck.bindings.deck import has_jupyter_extra 
+import instrument
 
+# pandas and fitz are imported inside the functions that use them, so importing
+# the parser (e.g. for PARSER_VERSION or the classifier) stays cheap.
+
+# Bump whenever a change to the parser can alter its output, so cached
+# results from older versions are not reused.
+PARSER_VERSION = "5"
 
 
 def find_statement_year_and_span(lines):
@@ -59,33 +65,87 @@ def find_statement_year_and_span(lines):
     return primary_year, spans_two_years
 
 
-def get_line_fingerprint(line):
+# Masked card numbers such as "4510 12** **** 3456", "XXXX XXXX XXXX 1234" or "**** **** **** 1234";
+# a lookbehind rather than \b, which never matches before a leading "*" or "•"
+_MASKED_CARD_RE = re.compile(r'(?<![0-9A-Za-z*•])((?:[0-9*Xx•]{4}[ -]?){3})([0-9]{4})\b')
+_CARD_ENDING_RE = re.compile(r'\bending\s+(?:in\s+)?(?:[*Xx•]+\s*)?(\d{4})\b', re.IGNORECASE)
+
+
+def find_statement_account(lines, max_lines=400):
     """
-    Creates a 'fingerprint' for a line based on its type and length.
-    This allows us to find repeating structural patterns.
+    Guesses which card / account a statement belongs to from the header lines.
+
+    Looks for a masked card number (at least one masked digit, so transaction
+    reference numbers are not taken for one) or a phrase like "ending in 1234".
 
-    Returns a tuple, e.g., ('DATE', 6), ('AMOUNT',), ('TEXT', 25).
+    :param lines: A list of strings from the PDF text.
+    :return: The last four digits as a string, or None if nothing was found.
     """
-    line = line.strip()
-    
-    # --- Feature Detection ---
-    
-    # AMOUNT: Very specific pattern. Length varies, so we don't include it in the fingerprint.
-    if re.fullmatch(r'-?\$?[\d,]+\.\d{2}', line):
-        return ('AMOUNT')
+    for line in islice(lines, max_lines):
+        match = _MASKED_CARD_RE.search(line)
+        if match and any(ch in match.group(1) for ch in '*Xx•'):
+            return match.group(2)
+        match = _CARD_ENDING_RE.search(line)
+        if match:
+            return match.group(1)
+    return None
 
-    # DATE: 'Mon Day' format. Length is usually consistent.
-    if re.fullmatch(r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2}', line, re.IGNORECASE):
-        return ('DATE')
-        
+
+class LineClassifier:
+    """
+    Labels lines as DATE / AMOUNT / ID_NUMBER / THANK_YOU / TEXT.
+
+    All the rules are folded into one precompiled alternation, so each line is
+    classified by a single regex dispatch. The alternatives keep the order of the
+    original checks (AMOUNT, DATE, ID_NUMBER, THANK_YOU, TEXT), which is what
+    decides the label when more than one could apply.
+    """
+    # AMOUNT: Very specific pattern. Length varies, so we don't include it in the fingerprint.
+    AMOUNT = r'-?\$?[\d,]+\.\d{2}'
+    # DATE: 'Mon Day' format. {space} is the whitespace class, filled in per use (lines, page text).
+    DATE = r'(?i:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec){space}+\d{{1,2}}'
     # ID_NUMBER: Long numeric string. Length can vary slightly, so we omit it.
-    if re.fullmatch(r'\d{10,}', line):
-        return ('ID_NUMBER')
-    
-    if r"thank"  in line.lower() or r"payment" in line.lower():
-        return ('THANK_YOU')
-    # TEXT: The default type. Length is a key feature here.
-    return ('TEXT')
+    ID_NUMBER = r'\d{10,}'
+    # THANK_YOU: payment lines, matched anywhere in the line
+    THANK_YOU = r'(?i:thank|payment)'
+
+    def __init__(self):
+        # same semantics as re.fullmatch on the stripped line
+        date = self.DATE.format(space=r'\s')
+        self._line_re = re.compile(
+            rf'^(?:(?:(?P<AMOUNT>{self.AMOUNT})|(?P<DATE>{date})|(?P<ID_NUMBER>{self.ID_NUMBER}))\Z'
+            rf'|(?P<THANK_YOU>.*?{self.THANK_YOU}.*)\Z'
+            rf'|(?P<TEXT>.*)\Z)',
+            re.DOTALL)
+
+    def classify(self, line):
+        """
+        Returns the label of a single line.
+        """
+        return self._line_re.match(line.strip()).lastgroup
+
+    def classify_batch(self, lines):
+        """
+        Labels many lines; accepts any iterable of strings (list, pandas Series, NumPy array).
+        (Scanning the joined lines with one finditer was measured no faster than this.)
+
+        :return: A list of labels aligned with `lines`.
+        """
+        match = self._line_re.match
+        return [match(str(line).strip()).lastgroup for line in lines]
+
+
+LINE_CLASSIFIER = LineClassifier()
+
+
+def get_line_fingerprint(line):
+    """
+    Creates a 'fingerprint' for a line based on its type.
+    This allows us to find repeating structural patterns.
+
+    Returns one of 'DATE', 'AMOUNT', 'ID_NUMBER', 'THANK_YOU' or 'TEXT'.
+    """
+    return LINE_CLASSIFIER.classify(line)
 
 
 def merge_consecutive_text_lines(lines, fingerprints):
@@ -136,107 +196,538 @@ def merge_consecutive_text_lines(lines, fingerprints):
     return merged_lines, merged_fingerprints
 
 
-def extract_transactions_dynamically(lines):
+# Fingerprints as small integers, so windows can be counted with array arithmetic
+FINGERPRINT_CODES = {'TEXT': 0, 'DATE': 1, 'AMOUNT': 2, 'ID_NUMBER': 3, 'THANK_YOU': 4}
+FINGERPRINT_LABELS = {code: label for label, code in FINGERPRINT_CODES.items()}
+_CODE_BASE = len(FINGERPRINT_CODES)
+# We assume a transaction pattern will be between 3 and 5 lines long
+PATTERN_LENGTHS = range(3, 6)
+
+
+def encode_fingerprints(fingerprints):
+    """
+    Converts a list of fingerprint labels into an int8 NumPy array of codes.
+    """
+    codes = FINGERPRINT_CODES
+    return np.fromiter((codes[fp] for fp in fingerprints), dtype=np.int8, count=len(fingerprints))
+
+
+def _window_codes(codes, length):
+    """
+    Rolling code of every `length`-line window: the window read as a base-5 number.
+    Returns an int64 array with one entry per window start.
+    """
+    n_windows = len(codes) - length + 1
+    keys = np.zeros(n_windows, dtype=np.int64)
+    for k in range(length):
+        keys *= _CODE_BASE
+        keys += codes[k : k + n_windows]
+    return keys
+
+
+def _encode_pattern(pattern):
+    key = 0
+    for fp in pattern:
+        key = key * _CODE_BASE + FINGERPRINT_CODES[fp]
+    return key
+
+
+def _decode_pattern(key, length):
+    pattern = []
+    for _ in range(length):
+        key, code = divmod(key, _CODE_BASE)
+        pattern.append(FINGERPRINT_LABELS[code])
+    return tuple(reversed(pattern))
+
+
+def discover_pattern_from_codes(codes):
+    """
+    Finds the most common window that looks like a transaction, on encoded fingerprints.
+
+    A window qualifies if it starts with a DATE and contains an AMOUNT and a TEXT.
+    The most frequent one wins; ties go to the longer pattern, then to the one
+    that first appears later in the document.
+
+    :param codes: Output of encode_fingerprints.
+    :return: The best pattern as a tuple of fingerprint labels, or None.
+    """
+    date, amount, text = FINGERPRINT_CODES['DATE'], FINGERPRINT_CODES['AMOUNT'], FINGERPRINT_CODES['TEXT']
+    best = None  # (count, length, first_position, key)
+    for length in PATTERN_LENGTHS:
+        n_windows = len(codes) - length + 1
+        if n_windows <= 0:
+            continue
+        has_amount = np.zeros(n_windows, dtype=bool)
+        has_text = np.zeros(n_windows, dtype=bool)
+        for k in range(length):
+            column = codes[k : k + n_windows]
+            has_amount |= column == amount
+            has_text |= column == text
+        valid = (codes[:n_windows] == date) & has_amount & has_text
+        if not valid.any():
+            continue
+
+        keys = _window_codes(codes, length)[valid]
+        positions = np.flatnonzero(valid)
+        unique_keys, first_idx, counts = np.unique(keys, return_index=True, return_counts=True)
+        first_positions = positions[first_idx]
+
+        max_count = counts.max()
+        top = np.flatnonzero(counts == max_count)
+        # Among equally frequent patterns, the one that first appears last
+        pick = top[np.argmax(first_positions[top])]
+        candidate = (int(max_count), length, int(first_positions[pick]), int(unique_keys[pick]))
+        if best is None or candidate[:3] > best[:3]:
+            best = candidate
+
+    if best is None:
+        return None
+    return _decode_pattern(best[3], best[1])
+
+
+def discover_transaction_pattern(fingerprints):
+    """
+    Finds the most common fingerprint window that looks like a transaction.
+
+    :param fingerprints: Fingerprints of the (merged) lines.
+    :return: The best pattern as a tuple of fingerprints, or None if nothing qualifies.
+    """
+    return discover_pattern_from_codes(encode_fingerprints(fingerprints))
+
+
+def find_pattern_matches(codes, pattern):
+    """
+    Start positions of the non-overlapping windows equal to `pattern`, scanning left to right.
+    """
+    length = len(pattern)
+    if len(codes) < length:
+        return []
+    candidates = np.flatnonzero(_window_codes(codes, length) == _encode_pattern(pattern))
+
+    # Greedy: once a window is taken, skip everything it covers
+    matches = []
+    next_free = 0
+    for pos in candidates.tolist():
+        if pos >= next_free:
+            matches.append(pos)
+            next_free = pos + length
+    return matches
+
+
+def build_transaction(raw_text_slice, best_pattern, primary_year, spans_two_years, parse_date=True):
+    """
+    Turns the lines of one matched pattern window into a transaction dict.
+
+    With parse_date=False the Date is left as a "Mon DD YYYY" string, so a caller
+    building many rows can convert the whole column in one go.
+    """
+    # Extract info based on the pattern's structure
+    date_str = raw_text_slice[ best_pattern.index(('DATE'))]
+    amount_str = raw_text_slice[best_pattern.index(('AMOUNT'))]
+    
+    # All non-date/amount/id lines are part of the merchant name
+    merchant_indices = [idx for idx, fp in enumerate(best_pattern) if fp == 'TEXT']
+    merchant = ' '.join([raw_text_slice[idx] for idx in merchant_indices])
+    amount = float(amount_str.replace('$', '').replace(',', ''))
+    
+    if spans_two_years and f'date_str.upper() contains "DEC"':
+        year = primary_year + 1
+    else:
+        year = primary_year
+    full_date = f"{date_str} {year}"
+    if parse_date:
+        import pandas as pd
+        full_date = pd.to_datetime(full_date, format="%b %d %Y", errors='coerce')
+
+    return {
+        "Date": full_date,
+        "Merchant": merchant,
+        "Amount": amount
+    }
+
+
+_MONTH_WORD_RE = re.compile(r'\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b', re.IGNORECASE)
+
+
+def layout_fingerprint(lines, fingerprints, max_header_lines=80):
+    """
+    Identifies a statement layout (issuer + product) from its header.
+
+    The header is everything before the first DATE line. Only its TEXT lines
+    without digits or month names are used: bank and card names, section and
+    column titles. Those repeat from one month to the next, while balances,
+    periods and dates do not.
+
+    :return: A hex digest, or None if the header has no usable lines.
+    """
+    import hashlib
+
+    header = []
+    for line, fp in islice(zip(lines, fingerprints), max_header_lines):
+        if fp == 'DATE':
+            break
+        if fp == 'TEXT' and not any(ch.isdigit() for ch in line) and not _MONTH_WORD_RE.search(line):
+            header.append(' '.join(line.upper().split()))
+    if not header:
+        return None
+    return hashlib.sha1('\n'.join(sorted(set(header))).encode('utf-8')).hexdigest()[:16]
+
+
+def _date_coverage(codes, n_matches, pattern):
+    # share of the DATE lines that ended up inside an extracted transaction
+    n_dates = int(np.count_nonzero(codes == FINGERPRINT_CODES['DATE']))
+    return n_matches * pattern.count('DATE') / n_dates if n_dates else 0.0
+
+
+def _template_fits(template, n_matches, coverage):
+    # a layout change shows up as far fewer DATE lines matched than when the template was learned
+    return n_matches > 0 and coverage >= 0.8 * template.get('coverage', 1.0)
+
+
+def extract_transactions_dynamically(lines, stats=None, templates=None):
     """
     A general-purpose transaction extractor that dynamically finds the most
     common data pattern in a PDF and uses it to extract data.
+
+    :param stats: Optional dict, filled with 'lines' (input line count), 'year',
+                  'spans_two_years', 'account', 'pattern' (the detected best_pattern or None),
+                  and with templates also 'layout', 'template' and 'coverage'.
+    :param templates: Optional {layout fingerprint: template} dict (TemplateRegistry.templates).
+                      A statement whose layout has a template skips pattern discovery;
+                      'template' in stats is then 'hit', or 'relearned' if the template
+                      failed validation, or 'learned' for a new layout.
+    :return: DataFrame with Date, Merchant and Cents in the compact schema of frames.py
+             (sorted by date); df.attrs['account'] holds the card / account detected
+             by find_statement_account (or None).
     """
-    primary_year, spans_two_years = find_statement_year_and_span(lines)
+    import pandas as pd
+    from frames import compact_transactions
+
+    with instrument.stage('year'):
+        primary_year, spans_two_years = find_statement_year_and_span(lines)
+        account = find_statement_account(lines)
+    if stats is not None:
+        stats.update(lines=len(lines), year=primary_year, spans_two_years=spans_two_years,
+                     account=account, pattern=None)
     # 2. Create a fingerprint for every single line in the document
-    initial_fingerprints = [get_line_fingerprint(line) for line in lines]
-    # 3. *** NEW STEP: Merge consecutive text lines ***
-    lines, fingerprints = merge_consecutive_text_lines(lines, initial_fingerprints)
-    
+    with instrument.stage('fingerprint'):
+        initial_fingerprints = LINE_CLASSIFIER.classify_batch(lines)
+        layout = layout_fingerprint(lines, initial_fingerprints) if templates is not None else None
+        # 3. *** NEW STEP: Merge consecutive text lines ***
+        lines, fingerprints = merge_consecutive_text_lines(lines, initial_fingerprints)
+        codes = encode_fingerprints(fingerprints)
 
-    # 3. Discover the most common transaction pattern
-    pattern_counts = Counter()
-    # We assume a transaction pattern will be between 3 and 6 lines long
-    for length in range(3, 6):
-        for i in range(len(fingerprints) - length + 1):
-            pattern = tuple(fingerprints[i : i + length])
-            
-            # A valid pattern must contain a DATE and an AMOUNT to be a transaction
-            has_date = any(fp == 'DATE' for fp in pattern)
-            has_amount = any(fp == 'AMOUNT' for fp in pattern)
-            has_txt = any(fp == 'TEXT' for fp in pattern)
-            
-            if has_date and has_amount and has_txt and pattern[0] == 'DATE':
-                pattern_counts[pattern] += 1
-    
-    if not pattern_counts:
-        print("Error: Could not automatically determine a recurring transaction pattern.")
-        return pd.DataFrame()
-
-    # The best pattern is the one that repeats most often
-    max_count = pattern_counts.most_common(1)[0][1]
-    top_patterns = [p for p, c in pattern_counts.items() if c == max_count]
-    best_pattern = top_patterns[-1]
-    # best_pattern = pattern_counts.most_common(1)[0][0]
+    # 3. Try the learned template of this layout first
+    best_pattern = None
+    status = None
+    template = templates.get(layout) if layout is not None else None
+    if template is not None:
+        with instrument.stage('template'):
+            best_pattern = tuple(template['pattern'])
+            matches = find_pattern_matches(codes, best_pattern)
+            coverage = _date_coverage(codes, len(matches), best_pattern)
+            if _template_fits(template, len(matches), coverage):
+                status = 'hit'
+            else:
+                best_pattern = None
+
+    # Otherwise discover the most common transaction pattern
+    if best_pattern is None:
+        with instrument.stage('discovery'):
+            best_pattern = discover_pattern_from_codes(codes)
+        if best_pattern is None:
+            print("Error: Could not automatically determine a recurring transaction pattern.")
+            return pd.DataFrame()
+        matches = find_pattern_matches(codes, best_pattern)
+        coverage = _date_coverage(codes, len(matches), best_pattern)
+        status = 'relearned' if template is not None else 'learned'
     # print(f"Success: Detected most common transaction pattern: {best_pattern}")
+    if stats is not None:
+        stats['pattern'] = best_pattern
+        if templates is not None:
+            stats.update(layout=layout, template=status, coverage=coverage)
+
+    # 4. Extract data using the 'best_pattern'
+    with instrument.stage('extraction'):
+        pattern_len = len(best_pattern)
+        transactions = [
+            build_transaction(lines[i : i + pattern_len], best_pattern, primary_year, spans_two_years, parse_date=False)
+            for i in matches
+        ]
+        df = pd.DataFrame(transactions)
+        if not df.empty:
+            df['Date'] = pd.to_datetime(df['Date'], format="%b %d %Y", errors='coerce')
+            df = compact_transactions(df)
+    df.attrs['account'] = account
+    return df
+
+
+# --- Streaming mode ---
+# For very long statements: pages are read lazily, lines are fingerprinted as
+# they arrive and transactions come out of a generator, so memory stays flat
+# instead of growing with the size of the document.
+
+def iter_pdf_lines(doc, select_pages=False):
+    """
+    Yields the non-empty, stripped text lines of an open fitz document, one page at a time.
+    With select_pages, pages that fail is_transaction_page (except the first) are skipped.
+    """
+    for number, page in enumerate(doc):
+        text = page.get_text()
+        if select_pages and number and not is_transaction_page(text):
+            continue
+        for line in text.split('\n'):
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_merged_lines(lines):
+    """
+    Streaming version of fingerprinting + merge_consecutive_text_lines.
+
+    :param lines: Any iterable of stripped text lines.
+    :return: A generator of (line, fingerprint) with consecutive TEXT lines joined.
+    """
+    classify = LINE_CLASSIFIER.classify
+    text_block = []
+    for line in lines:
+        fp = classify(line)
+        if fp == 'TEXT':
+            text_block.append(line)
+            continue
+        if text_block:
+            yield ' '.join(text_block), 'TEXT'
+            text_block = []
+        yield line, fp
+    if text_block:
+        yield ' '.join(text_block), 'TEXT'
 
-    # 4. Extract data using the discovered 'best_pattern'
-    transactions = []
+
+def _trim_repeated_pattern(pattern):
+    """
+    Cuts a pattern that runs into the start of the next transaction, e.g.
+    (DATE, TEXT, AMOUNT, DATE) -> (DATE, TEXT, AMOUNT).
+
+    A prefix cut at an arbitrary line can make such a window tie with the real
+    transaction shape, and ties go to the longer pattern.
+    """
+    for k in range(3, len(pattern)):
+        head = pattern[:k]
+        if pattern[k] == 'DATE' and 'AMOUNT' in head and 'TEXT' in head:
+            return head
+    return pattern
+
+
+def iter_transactions_streaming(lines, prefix_size=5000):
+    """
+    Generator counterpart of extract_transactions_dynamically.
+
+    The statement year and the transaction pattern are detected from the first
+    `prefix_size` lines only; everything after that is matched against the
+    pattern through a sliding window and never held in memory as a whole.
+
+    :param lines: Any iterable of stripped text lines, e.g. iter_pdf_lines(doc).
+    :param prefix_size: How many lines are buffered for year and pattern detection.
+    :return: A generator of transaction dicts with Date, Merchant and Amount.
+    :raises ValueError: No recurring transaction pattern in the first `prefix_size` lines;
+                        ingest_pdfs records it as the file's error, which cli.py and app.py report.
+    """
+    lines = iter(lines)
+    prefix = list(islice(lines, prefix_size))
+    primary_year, spans_two_years = find_statement_year_and_span(prefix)
+
+    merged = iter_merged_lines(chain(prefix, lines))
+    del prefix
+    head = list(islice(merged, prefix_size))
+    best_pattern = discover_transaction_pattern([fp for _, fp in head])
+    if best_pattern is None:
+        raise ValueError("Could not automatically determine a recurring transaction pattern")
+    best_pattern = _trim_repeated_pattern(best_pattern)
+
+    # Same greedy left-to-right matching as the in-memory extractor
     pattern_len = len(best_pattern)
+    window = deque()
+    for item in chain(head, merged):
+        window.append(item)
+        if len(window) < pattern_len:
+            continue
+        if tuple(fp for _, fp in window) == best_pattern:
+            raw_text_slice = [line for line, _ in window]
+            yield build_transaction(raw_text_slice, best_pattern, primary_year, spans_two_years)
+            window.clear()
+        else:
+            window.popleft()
 
-    i = 0
-    while i <= len(lines) - pattern_len:
-        current_fingerprint_slice = tuple(fingerprints[i : i + pattern_len])
-        
-        # If the current slice of fingerprints matches our best pattern
-        if current_fingerprint_slice == best_pattern:
-            raw_text_slice = lines[i : i + pattern_len]
-            
-            # Extract info based on the pattern's structure
-            date_str = raw_text_slice[ best_pattern.index(('DATE'))]
-            amount_str = raw_text_slice[best_pattern.index(('AMOUNT'))]
-            
-            # All non-date/amount/id lines are part of the merchant name
-            merchant_indices = [idx for idx, fp in enumerate(best_pattern) if fp == 'TEXT']
-            merchant = ' '.join([raw_text_slice[idx] for idx in merchant_indices])
-            amount = float(amount_str.replace('$', '').replace(',', ''))
-            
-            if spans_two_years and f'date_str.upper() contains "DEC"':
-                year = primary_year + 1
-            else:
-                year = primary_year
-            full_date = pd.to_datetime(f"{date_str} {year}", format="%b %d %Y", errors='coerce')
-
-            transactions.append({
-                "Date": full_date,
-                "Merchant": merchant,
-                "Amount": amount
-            })
-            # Jump forward by the length of the pattern to find the next one
-            i += pattern_len
+
+def open_pdf(source):
+    """
+    Opens a PDF with fitz from a file path, or straight from memory when
+    `source` is bytes, a bytearray or a memoryview (e.g. UploadedFile.getbuffer()),
+    without copying it to disk.
+    """
+    import fitz
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype='pdf')
+    return fitz.open(source)
+
+
+def stream_transactions_from_pdf(path, prefix_size=5000):
+    """
+    Yields transactions from the PDF at `path` (or in-memory bytes) without loading the whole document text.
+    """
+    doc = open_pdf(path)
+    try:
+        yield from iter_transactions_streaming(iter_pdf_lines(doc, select_pages=True), prefix_size)
+    finally:
+        doc.close()
+
+
+# Lines that are a whole DATE or AMOUNT token, as LineClassifier would label them
+_INLINE_SPACE = r'[^\S\n]'
+_TRANSACTION_LINE_RE = re.compile(
+    rf'^{_INLINE_SPACE}*(?:(?P<DATE>{LineClassifier.DATE.format(space=_INLINE_SPACE)})'
+    rf'|(?P<AMOUNT>{LineClassifier.AMOUNT})){_INLINE_SPACE}*$',
+    re.MULTILINE)
+
+
+def page_token_counts(text):
+    """
+    Cheap page prefilter: counts the lines of a page's text that are a date or an amount.
+    :return: (date lines, amount lines)
+    """
+    dates = amounts = 0
+    for match in _TRANSACTION_LINE_RE.finditer(text):
+        if match.lastgroup == 'DATE':
+            dates += 1
         else:
-            i += 1
-            
-    return pd.DataFrame(transactions)
+            amounts += 1
+    return dates, amounts
+
+
+def is_transaction_page(text, min_dates=1, min_amounts=1):
+    """
+    True if a page looks like part of a transaction table. Legal text, rewards
+    summaries and interest disclosures have no date and amount lines; a page
+    with a single transaction (one date line, e.g. the last page of a
+    one-date layout) is kept, so no transaction is dropped to save time.
+    """
+    dates, amounts = page_token_counts(text)
+    return dates >= min_dates and amounts >= min_amounts
 
 
+def _page_texts(source, start, stop):
+    # worker for read_page_texts: one fitz document per process
+    doc = open_pdf(source)
+    try:
+        return [doc[number].get_text() for number in range(start, stop)]
+    finally:
+        doc.close()
 
 
-if __name__ == "__main__":
-    path = r"F:\Work\github\BankAcount\example_pdf\2025-03.pdf"
-    path = r"F:\Work\github\BankAcount\example_pdf\5415902751986709_2024_12_07_2025_01_06.pdf"
-    path = r"F:\Work\github\BankAcount\example_pdf\Account Statement-May.pdf"
+def read_page_texts(path, page_workers=1):
+    """
+    Extracts the text of every page.
 
-    doc = fitz.open(path)
-    full_text = "".join(page.get_text() for page in doc)
-    lines = [line.strip() for line in full_text.split('\n') if line.strip()]
+    :param page_workers: With more than one, the pages of a large document are split
+                         into ranges extracted by separate processes (fitz documents
+                         cannot be shared between threads).
+    :return: A list with one text string per page.
+    """
+    doc = open_pdf(path)
+    try:
+        page_count = doc.page_count
+        if page_workers <= 1 or page_count < 4 * page_workers:
+            return [page.get_text() for page in doc]
+    finally:
+        doc.close()
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    source = bytes(path) if isinstance(path, (bytearray, memoryview)) else path
+    step = -(-page_count // page_workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    with ProcessPoolExecutor(max_workers=page_workers) as pool:
+        chunks = pool.map(_page_texts, [source] * len(ranges), *zip(*ranges))
+        return [text for chunk in chunks for text in chunk]
+
+
+def read_pdf_lines(path, select_pages=False, page_workers=1, stats=None):
+    """
+    Reads a PDF (path or in-memory bytes, see open_pdf) and returns its non-empty, stripped text lines.
+
+    :param select_pages: Keep only the first page and pages that pass is_transaction_page.
+    :param page_workers: Processes for page text extraction, see read_page_texts.
+    :param stats: Optional dict, filled with 'pages' and 'pages_kept'.
+    """
+    with instrument.stage('pdf_text'):
+        texts = read_page_texts(path, page_workers)
+    if select_pages:
+        with instrument.stage('page_filter'):
+            kept = [text for number, text in enumerate(texts) if number == 0 or is_transaction_page(text)]
+    else:
+        kept = texts
+    if stats is not None:
+        stats.update(pages=len(texts), pages_kept=len(kept))
+    full_text = "".join(kept)
+    return [line.strip() for line in full_text.split('\n') if line.strip()]
+
+
+def extract_transactions_from_pdf(path, streaming=False, stats=None, templates=None,
+                                  select_pages=True, page_workers=1, fast_path=True):
+    """
+    Convenience wrapper: reads the PDF at `path` (a file path or the PDF bytes)
+    and extracts its transactions.
+    `templates` is passed on to extract_transactions_dynamically.
+
+    With fast_path, statements of a known issuer are handled by its parser in
+    parsers.REGISTRY and everything else by the dynamic extractor; without it
+    the dynamic extractor parses every statement.
+
+    By default only the first page and the pages that look like transaction
+    tables are parsed (see is_transaction_page), so pages of legal text neither
+    cost fingerprinting time nor skew pattern discovery.
+
+    With streaming=True the text is read page by page through
+    stream_transactions_from_pdf instead of being joined into one string
+    (`stats` is only filled in the non-streaming mode).
+    """
+    with instrument.stage('parse', file=path if isinstance(path, str) else None):
+        if streaming:
+            import pandas as pd
+            from frames import compact_transactions
+            return compact_transactions(pd.DataFrame(list(stream_transactions_from_pdf(path))))
+        lines = read_pdf_lines(path, select_pages=select_pages, page_workers=page_workers, stats=stats)
+        if fast_path:
+            # imported here: parsers builds on this module
+            from parsers import REGISTRY
+            return REGISTRY.parse(lines, stats=stats, templates=templates)
+        return extract_transactions_dynamically(lines, stats=stats, templates=templates)
+
+
+
+
+if __name__ == "__main__":
+    import sys
 
+    if len(sys.argv) != 2:
+        print("usage: python general_pdf_extrract.py STATEMENT.pdf  (see cli.py for batch conversion)")
+        sys.exit(2)
+    path = sys.argv[1]
 
-    # 2. Run the dynamic extraction function on our dummy file
+    # 1. Run the dynamic extraction function on the given file
     print(f"--- Running Dynamic Parser on '{path}' ---")
-    primary_year, spans_two_years = find_statement_year_and_span(lines)
-    extracted_df = extract_transactions_dynamically(lines, primary_year, spans_two_years)
+    stats = {}
+    extracted_df = extract_transactions_from_pdf(path, stats=stats)
+    print(f"Parser: {stats.get('parser')}, detected pattern: {stats.get('pattern')}, year: {stats.get('year')}")
 
-    # 3. Print the results
+    # 2. Print the results
     print("--- Extracted Transactions ---")
     if not extracted_df.empty:
         print(extracted_df)
-        print(extracted_df['Amount'].sum())
-        print(extracted_df[extracted_df['Amount'] >= 0]['Amount'].sum())
+        cents = extracted_df['Cents']
+        print(cents.sum() / 100)
+        print(cents[cents >= 0].sum() / 100)
     else:
         print("No transactions were extracted.")
-        
\ No newline at end of file
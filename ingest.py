@@ -0,0 +1,345 @@
+import hashlib
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import instrument
+from general_pdf_extrract import extract_transactions_from_pdf
+from parse_cache import ParseCache
+from parsers import REGISTRY as PARSERS
+
+# One entry per input file: `df` is None when parsing failed, `error` is None when it succeeded.
+# `seconds`, `lines`, `pattern` and `parser` (see parsers.REGISTRY) describe the parse;
+# they are None for cache hits.
+IngestResult = namedtuple('IngestResult', ['source', 'df', 'error', 'seconds', 'lines', 'pattern', 'parser'],
+                          defaults=(None, None, None, None))
+
+# A statement held in memory, e.g. an upload: `data` is bytes or a memoryview over
+# the uploaded buffer, parsed with fitz.open(stream=...) without touching the disk.
+PdfBuffer = namedtuple('PdfBuffer', ['name', 'data'])
+
+
+def _source_name(source):
+    return source.name if isinstance(source, PdfBuffer) else source
+
+
+def _parse_pdf(path, instrumented=False, memory=False, templates=None):
+    # Runs in a worker process: fitz text extraction + pattern discovery for one file
+    # (`path` may also be the PDF bytes).
+    # With `instrumented`, the worker records its own stages and hands them back in stats['events'].
+    if instrumented:
+        instrument.RECORDER.clear()
+        instrument.enable(memory)
+    start = time.perf_counter()
+    stats = {}
+    df = extract_transactions_from_pdf(path, stats=stats, templates=templates)
+    seconds = time.perf_counter() - start
+    if instrumented:
+        stats['events'] = instrument.RECORDER.events
+        instrument.RECORDER.clear()
+    return df, seconds, stats
+
+
+def _format_error(exc):
+    return f"{type(exc).__name__}: {exc}"
+
+
+def ingest_pdfs(paths, max_workers=None, cache=None, keys=None, normalizer=None, templates=None,
+                on_result=None):
+    """
+    Parses many statements in parallel with a process pool.
+
+    :param paths: PDF file paths and / or in-memory PdfBuffers to parse.
+    :param max_workers: Number of worker processes (None = one per CPU, 1 = parse inline).
+    :param cache: Optional ParseCache; hits are served from it and misses are written back.
+    :param keys: Optional list of precomputed cache keys, aligned with `paths`.
+    :param normalizer: Optional MerchantNormalizer applied to the Merchant column of every
+                       result. The cache always holds the raw extraction, so edits to the
+                       merchant map apply without reparsing.
+    :param templates: Optional TemplateRegistry; statements of a known layout skip pattern
+                      discovery, and new or re-learned layouts are recorded in it.
+    :param on_result: Optional callback, called with (index, IngestResult) as soon as each
+                      file is done (cache hit, parsed or failed), in completion order.
+    :return: A list of IngestResult in the same order as `paths`. A file that fails
+             to parse gets its error recorded instead of aborting the batch.
+    """
+    paths = list(paths)
+    results = [None] * len(paths)
+    todo = []
+
+    def done(idx, result):
+        if normalizer is not None:
+            result = normalize_result(result, normalizer)
+        results[idx] = result
+        if on_result is not None:
+            on_result(idx, result)
+
+    for idx, source in enumerate(paths):
+        key = None
+        name = _source_name(source)
+        if cache is not None:
+            try:
+                key = keys[idx] if keys is not None else None
+                if key is None and isinstance(source, PdfBuffer):
+                    key = ParseCache.key(source.data)
+                elif key is None:
+                    with open(source, 'rb') as f:
+                        key = ParseCache.key(f.read())
+            except OSError as e:
+                done(idx, IngestResult(name, None, _format_error(e)))
+                continue
+            with instrument.stage('cache_lookup', file=name):
+                df = cache.get(key)
+            if df is not None:
+                done(idx, IngestResult(name, df, None))
+                continue
+        todo.append((idx, source, key))
+
+    def finish(idx, path, key, parsed):
+        df, seconds, stats = parsed
+        instrument.RECORDER.merge(stats.pop('events', None), file=path)
+        if templates is not None:
+            templates.record(stats)
+        # counted here rather than in the parser, so parses in worker processes count too
+        PARSERS.record(stats)
+        if cache is not None:
+            cache.put(key, df)
+        done(idx, IngestResult(path, df, None, seconds, stats.get('lines'), stats.get('pattern'),
+                               stats.get('parser')))
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    workers = min(max_workers, len(todo))
+
+    snapshot = templates.templates if templates is not None else None
+    if workers <= 1:
+        for idx, source, key in todo:
+            name = _source_name(source)
+            try:
+                # in-process: a memoryview goes to fitz as is, no copy
+                data = source.data if isinstance(source, PdfBuffer) else source
+                with instrument.stage('ingest_file', file=name):
+                    finish(idx, name, key, _parse_pdf(data, templates=snapshot))
+            except Exception as e:
+                done(idx, IngestResult(name, None, _format_error(e)))
+    else:
+        recorder = instrument.RECORDER
+        # spawned, not forked: ingest_pdfs runs on the IngestQueue thread of a multi-threaded
+        # server, and a forked child could inherit locks held by the other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {}
+            for idx, source, key in todo:
+                # worker processes need picklable bytes, memoryviews are copied once here
+                data = bytes(source.data) if isinstance(source, PdfBuffer) else source
+                future = pool.submit(_parse_pdf, data, recorder.enabled, recorder.memory, snapshot)
+                futures[future] = (idx, _source_name(source), key)
+            for future in as_completed(futures):
+                idx, name, key = futures[future]
+                try:
+                    finish(idx, name, key, future.result())
+                except Exception as e:
+                    done(idx, IngestResult(name, None, _format_error(e)))
+
+    return results
+
+
+# Status of one file in an IngestQueue: `state` is one of IngestQueue.QUEUED, PARSING,
+# DONE or FAILED; `error` is set for FAILED, `seconds` (parse time) for parsed files.
+FileStatus = namedtuple('FileStatus', ['name', 'state', 'error', 'seconds'], defaults=(None, None))
+
+
+class IngestQueue:
+    """
+    Parses statements on a background thread, so an upload never blocks a script run.
+
+    Files are submitted with their parse-cache key and picked up in batches by
+    one daemon worker thread, which runs ingest_pdfs on them (with its process
+    pool) and hands every finished statement to `store` right away, so it can be
+    shown while the rest of the batch is still parsing. Status is tracked per
+    content key and owner, which lets any script run (or session) look it up.
+
+    The owner is where a statement goes, e.g. the ledger of one session when
+    sessions are isolated; the same PDF submitted by two owners is parsed once
+    and stored for each. Each job also carries the instrument session of its
+    submitter, so diagnostics recorded while parsing and storing it are only
+    shown to that session (see instrument.set_session).
+    """
+    QUEUED, PARSING, DONE, FAILED = 'queued', 'parsing', 'done', 'failed'
+
+    def __init__(self, store, cache=None, templates=None, max_workers=None, max_finished=1000):
+        """
+        :param store: Called on the worker thread with (name, key, df, owner) for each parsed
+                      statement, e.g. to add it to the Ledger. An exception marks the file failed.
+        :param cache: Optional ParseCache, see ingest_pdfs.
+        :param templates: Optional TemplateRegistry, see ingest_pdfs.
+        :param max_workers: Worker processes per batch, see ingest_pdfs.
+        :param max_finished: Statuses of done / failed files kept for status(); older ones are dropped.
+        """
+        self.store = store
+        self.cache = cache
+        self.templates = templates
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._jobs = queue.Queue()
+        self._status = {}
+        # (owner, key) of finished files, oldest first
+        self._finished = deque()
+        # reentrant: join() checks pending() while holding the condition's lock
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+
+    def submit(self, name, key, data, owner=None, session=None):
+        """
+        Queues one statement.
+        :param data: The PDF bytes or a memoryview, kept only until the file is parsed.
+        :param owner: Passed on to `store`; None when every statement goes to the same place.
+        :param session: Instrument session the ingest events are tagged with, see instrument.set_session.
+        :return: False if the key is already queued, parsing or done for this owner.
+        """
+        with self._lock:
+            status = self._status.get((owner, key))
+            if status is not None and status.state != self.FAILED:
+                return False
+            self._status[(owner, key)] = FileStatus(name, self.QUEUED)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ingest-queue', daemon=True)
+                self._thread.start()
+        self._jobs.put((name, key, data, owner, session))
+        return True
+
+    def status(self, key, owner=None):
+        """
+        :return: The FileStatus of `key` for `owner`, or None if it was never submitted.
+        """
+        with self._lock:
+            return self._status.get((owner, key))
+
+    def pending(self):
+        """
+        :return: Number of files queued or parsing.
+        """
+        with self._lock:
+            return sum(status.state in (self.QUEUED, self.PARSING) for status in self._status.values())
+
+    def join(self, timeout=None):
+        """
+        Waits until nothing is queued or parsing.
+        :return: True if idle, False on timeout.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self.pending() == 0, timeout)
+
+    def _set(self, job, state, **fields):
+        _, key, _, owner, _ = job
+        with self._lock:
+            self._status[(owner, key)] = self._status[(owner, key)]._replace(state=state, **fields)
+            if state in (self.DONE, self.FAILED):
+                self._finished.append((owner, key))
+                while len(self._finished) > self.max_finished:
+                    oldest = self._finished.popleft()
+                    # unless it was submitted again since
+                    if self._status.get(oldest, FileStatus(None, self.DONE)).state in (self.DONE, self.FAILED):
+                        self._status.pop(oldest, None)
+            self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            batch = [self._jobs.get()]
+            # take everything queued meanwhile, so the batch is parsed in parallel
+            while True:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            for job in batch:
+                self._set(job, self.PARSING)
+            self._ingest(batch)
+
+    def _ingest(self, batch):
+        # jobs by content key: the same statement from several owners is parsed once,
+        # its parse tagged with the session of the first submitter
+        by_key = {}
+        for job in batch:
+            by_key.setdefault(job[1], []).append(job)
+        # one ingest_pdfs run per session, so events recorded on this thread carry its tag
+        by_session = {}
+        for jobs in by_key.values():
+            by_session.setdefault(jobs[0][4], []).append(jobs[0])
+        try:
+            for session, unique in by_session.items():
+                instrument.set_session(session)
+                self._ingest_unique(unique, by_key, session)
+        finally:
+            instrument.set_session(None)
+
+    def _ingest_unique(self, unique, by_key, session):
+        def on_result(idx, result):
+            for job in by_key[unique[idx][1]]:
+                name, key, _, owner, job_session = job
+                if result.error is not None:
+                    self._set(job, self.FAILED, error=result.error)
+                    continue
+                # storing is recorded for the session that owns this copy
+                instrument.set_session(job_session)
+                try:
+                    self.store(name, key, result.df, owner)
+                except Exception as e:
+                    self._set(job, self.FAILED, error=_format_error(e))
+                    continue
+                finally:
+                    instrument.set_session(session)
+                self._set(job, self.DONE, seconds=result.seconds)
+
+        try:
+            with instrument.stage('ingest'):
+                ingest_pdfs([PdfBuffer(job[0], job[2]) for job in unique], max_workers=self.max_workers,
+                            cache=self.cache, keys=[job[1] for job in unique], templates=self.templates,
+                            on_result=on_result)
+        except Exception as e:
+            # e.g. the process pool could not start; nothing in the batch may stay "parsing"
+            for job in (job for first in unique for job in by_key[first[1]]):
+                status = self.status(job[1], job[3])
+                if status is not None and status.state in (self.QUEUED, self.PARSING):
+                    self._set(job, self.FAILED, error=_format_error(e))
+
+
+def archive_pdf(data, directory):
+    """
+    Keeps a content-addressed copy of a statement: <directory>/<sha256[:2]>/<sha256>.pdf.
+    The same bytes uploaded twice, under any name, are stored once.
+
+    :param data: The PDF bytes (or a memoryview).
+    :return: The archive path.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    folder = os.path.join(directory, digest[:2])
+    path = os.path.join(folder, f"{digest}.pdf")
+    if os.path.exists(path):
+        return path
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def normalize_result(result, normalizer):
+    """
+    Replaces the raw Merchant column of a successful result with normalized, categorical names.
+    """
+    if result.df is None or 'Merchant' not in result.df:
+        return result
+    df = result.df.copy(deep=False)
+    df['Merchant'] = normalizer.normalize_column(df['Merchant'])
+    return result._replace(df=df)
@@ -0,0 +1,333 @@
+"""
+Lightweight per-stage instrumentation for the extraction pipeline and the dashboard.
+
+    import instrument
+    with instrument.stage('fingerprint'):
+        ...
+
+Every stage records wall time, a call count and, when memory tracking is on,
+the peak allocation seen by tracemalloc while it ran. tracemalloc has a single
+process-wide peak, so a stage that overlapped a stage on another thread
+records no peak (peak_bytes None) rather than one mixing both threads. Stages nest; a stage
+opened inside `instrument.stage('parse', file='a.pdf')` is attributed to that
+file. When recording is off, `stage()` returns a shared no-op context manager,
+so instrumented code costs one function call and one attribute check.
+
+Results can be summarized as a DataFrame or exported as JSON or in the Chrome
+trace format (load it in chrome://tracing or https://ui.perfetto.dev).
+
+The recorder is process-wide. When several users (e.g. dashboard sessions)
+want recording, each one subscribe()s: recording runs while at least one is
+subscribed, so one turning it off does not stop it for the others. Events are
+tagged with the session set on the recording thread (set_session), and the
+summaries / exports / clear() can be limited to one session; events recorded
+without a session are included in all. The background parser tags each file
+with the session that submitted it.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('recorder', 'name', 'file', 'start_ns', 'start', 'start_mem', 'child_peak', 'overlaps')
+
+    def __init__(self, recorder, name, file):
+        self.recorder = recorder
+        self.name = name
+        self.file = file
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        if self.file is None and stack:
+            self.file = stack[-1].file
+        stack.append(self)
+        if self.recorder.memory and tracemalloc.is_tracing():
+            self.overlaps = self.recorder._enter_thread(len(stack) == 1)
+            self.start_mem = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            self.start_mem = None
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        stack = self.recorder._stack()
+        stack.pop()
+        peak = None
+        if self.start_mem is not None:
+            # None if another thread was in a stage meanwhile: its reset_peak() and allocations
+            # would have mixed into ours
+            alone = self.recorder._exit_thread(not stack, self.overlaps)
+            if alone and tracemalloc.is_tracing():
+                # reset_peak() inside nested stages hides their peaks from us, so
+                # children hand their absolute peak up the stack
+                absolute_peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+                peak = max(0, absolute_peak - self.start_mem)
+                if stack:
+                    stack[-1].child_peak = max(stack[-1].child_peak, absolute_peak)
+        self.recorder.record(self.name, seconds, file=self.file, start_ns=self.start_ns,
+                             peak_bytes=peak, depth=len(stack))
+        return False
+
+
+class Recorder:
+    """
+    Collects stage events. One process-wide instance lives in `RECORDER`;
+    the module-level functions below operate on it.
+
+    Each event is a dict with name, file, seconds, start_ns (wall clock),
+    peak_bytes (None without memory tracking or when another thread was in a
+    stage too), depth, pid, tid and session.
+    """
+    # a subscriber that has not renewed its subscription for this long is dropped,
+    # so a closed browser tab does not keep recording on
+    SUBSCRIPTION_TTL = 600
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.events = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        # subscriber -> (memory, time of the last subscribe())
+        self._subscribers = {}
+        # threads inside a memory-tracked stage, and how often a thread joined others in one
+        self._active_threads = 0
+        self._overlaps = 0
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter_thread(self, outermost):
+        # :return: the overlap count to compare against in _exit_thread
+        with self._lock:
+            if outermost:
+                self._active_threads += 1
+                if self._active_threads > 1:
+                    self._overlaps += 1
+            return self._overlaps if self._active_threads == 1 else None
+
+    def _exit_thread(self, outermost, overlaps):
+        # :return: True if no other thread was in a stage since the matching _enter_thread
+        with self._lock:
+            alone = overlaps is not None and overlaps == self._overlaps and self._active_threads == 1
+            if outermost:
+                self._active_threads -= 1
+            return alone
+
+    def enable(self, memory=False):
+        """
+        Starts recording.
+        :param memory: Also track peak allocations with tracemalloc (slows Python code down noticeably).
+        """
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        elif not memory and self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def disable(self):
+        self.enabled = False
+        self.memory = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def subscribe(self, subscriber, memory=False):
+        """
+        Asks for recording on behalf of `subscriber` (e.g. a session id); renew it on every use.
+        Memory is tracked while any subscriber asks for it.
+        """
+        self._update_subscribers(subscriber, (memory, time.monotonic()))
+
+    def unsubscribe(self, subscriber):
+        """
+        Withdraws a subscription; recording stops once no subscriber is left.
+        """
+        self._update_subscribers(subscriber, None)
+
+    def _update_subscribers(self, subscriber, subscription):
+        with self._lock:
+            if subscription is None:
+                self._subscribers.pop(subscriber, None)
+            else:
+                self._subscribers[subscriber] = subscription
+            expired = time.monotonic() - self.SUBSCRIPTION_TTL
+            self._subscribers = {key: value for key, value in self._subscribers.items() if value[1] >= expired}
+            subscribers = list(self._subscribers.values())
+        if subscribers:
+            self.enable(memory=any(memory for memory, _ in subscribers))
+        elif self.enabled:
+            self.disable()
+
+    def set_session(self, session):
+        """
+        Tags the events recorded on the current thread with `session` (None for shared work).
+        """
+        self._local.session = session
+
+    def clear(self, session=None):
+        """
+        Drops the recorded events; with `session`, only the events of that session and the shared ones.
+        """
+        with self._lock:
+            if session is None:
+                self.events = []
+            else:
+                self.events = [event for event in self.events if event.get('session') not in (session, None)]
+
+    def _events(self, session=None):
+        with self._lock:
+            if session is None:
+                return list(self.events)
+            return [event for event in self.events if event.get('session') in (session, None)]
+
+    def stage(self, name, file=None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, file)
+
+    def record(self, name, seconds, file=None, start_ns=None, peak_bytes=None, depth=0):
+        """
+        Adds one event directly, for timings measured elsewhere (e.g. in a worker process).
+        """
+        if not self.enabled:
+            return
+        if start_ns is None:
+            start_ns = time.time_ns() - int(seconds * 1e9)
+        event = {'name': name, 'file': file, 'seconds': seconds, 'start_ns': start_ns,
+                 'peak_bytes': peak_bytes, 'depth': depth,
+                 'pid': os.getpid(), 'tid': threading.get_ident(),
+                 'session': getattr(self._local, 'session', None)}
+        with self._lock:
+            self.events.append(event)
+
+    def merge(self, events, file=None):
+        """
+        Adds events recorded by another Recorder, e.g. returned from a worker process.
+        :param file: Attribute events without a file to this one.
+        Events without a session get the session of the current thread.
+        """
+        if not self.enabled or not events:
+            return
+        session = getattr(self._local, 'session', None)
+        with self._lock:
+            for event in events:
+                if file is not None and event.get('file') is None:
+                    event = dict(event, file=file)
+                if session is not None and event.get('session') is None:
+                    event = dict(event, session=session)
+                self.events.append(event)
+
+    def summary(self, by_file=False, session=None):
+        """
+        :param session: Only the events of this session and the shared ones.
+        :return: DataFrame with Stage (and File), Calls, Total s, Mean ms, Max ms and Peak MB,
+                 slowest stages first.
+        """
+        import pandas as pd
+
+        columns = ['Stage', 'File'] if by_file else ['Stage']
+        events = self._events(session)
+        if not events:
+            return pd.DataFrame(columns=columns + ['Calls', 'Total s', 'Mean ms', 'Max ms', 'Peak MB'])
+        df = pd.DataFrame(events).rename(columns={'name': 'Stage', 'file': 'File'})
+        df['File'] = df['File'].fillna('')
+        df['peak_bytes'] = df['peak_bytes'].astype('float64')
+        grouped = df.groupby(columns, sort=False).agg(
+            Calls=('seconds', 'size'), total=('seconds', 'sum'),
+            mean=('seconds', 'mean'), max=('seconds', 'max'), peak=('peak_bytes', 'max'))
+        result = pd.DataFrame({
+            'Calls': grouped['Calls'],
+            'Total s': grouped['total'].round(4),
+            'Mean ms': (grouped['mean'] * 1000).round(2),
+            'Max ms': (grouped['max'] * 1000).round(2),
+            'Peak MB': (grouped['peak'] / 2**20).round(2),
+        })
+        return result.sort_values('Total s', ascending=False).reset_index()
+
+    def to_json(self, session=None):
+        events = self._events(session)
+        return json.dumps({'memory': self.memory, 'events': events}, indent=2)
+
+    def to_chrome_trace(self, session=None):
+        """
+        :return: The events as a Chrome trace JSON string ("X" complete events, microseconds).
+        """
+        events = self._events(session)
+        trace = []
+        for event in events:
+            args = {}
+            if event['file']:
+                args['file'] = event['file']
+            if event['peak_bytes'] is not None:
+                args['peak_bytes'] = event['peak_bytes']
+            trace.append({
+                'name': event['name'], 'cat': 'pipeline', 'ph': 'X',
+                'ts': event['start_ns'] / 1000, 'dur': event['seconds'] * 1e6,
+                'pid': event['pid'], 'tid': event['tid'], 'args': args,
+            })
+        return json.dumps({'traceEvents': trace, 'displayTimeUnit': 'ms'})
+
+
+RECORDER = Recorder()
+
+
+def stage(name, file=None):
+    """
+    Context manager timing one stage; a no-op while recording is disabled.
+    :param file: The file the stage works on; nested stages inherit it.
+    """
+    if not RECORDER.enabled:
+        return _NULL_STAGE
+    return _Stage(RECORDER, name, file)
+
+
+def enabled():
+    return RECORDER.enabled
+
+
+def enable(memory=False):
+    RECORDER.enable(memory)
+
+
+def disable():
+    RECORDER.disable()
+
+
+def subscribe(subscriber, memory=False):
+    RECORDER.subscribe(subscriber, memory)
+
+
+def unsubscribe(subscriber):
+    RECORDER.unsubscribe(subscriber)
+
+
+def set_session(session):
+    RECORDER.set_session(session)
@@ -0,0 +1,534 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+import pandas as pd
+from dedup import DedupIndex, transaction_keys
+from frames import amount_cents, compact_cells, compact_transactions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    id          INTEGER PRIMARY KEY,
+    source      TEXT NOT NULL,          -- original file name
+    content_key TEXT NOT NULL UNIQUE,   -- sha256 of the PDF bytes
+    start_date  TEXT,
+    end_date    TEXT,
+    row_count   INTEGER NOT NULL,
+    added_at    TEXT NOT NULL,
+    account     TEXT,                   -- last digits of the card, see find_statement_account
+    duplicate_count INTEGER NOT NULL DEFAULT 0, -- rows already stored by another statement (duplicate = 1)
+    parser_version TEXT                 -- general_pdf_extrract.PARSER_VERSION the rows were parsed with
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id            INTEGER PRIMARY KEY,
+    statement_id  INTEGER NOT NULL REFERENCES statements(id) ON DELETE CASCADE,
+    date          TEXT NOT NULL,        -- ISO yyyy-mm-dd
+    raw_merchant  TEXT NOT NULL,        -- as extracted from the PDF
+    merchant      TEXT NOT NULL,        -- normalized through the MerchantMap
+    category      TEXT NOT NULL,
+    amount_cents  INTEGER NOT NULL,
+    dedup_key     TEXT,                 -- see dedup.transaction_keys
+    duplicate     INTEGER NOT NULL DEFAULT 0  -- 1: a copy of a row of another statement, left out of totals
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS idx_transactions_merchant ON transactions(merchant);
+CREATE INDEX IF NOT EXISTS idx_transactions_raw_merchant ON transactions(raw_merchant);
+CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category);
+CREATE INDEX IF NOT EXISTS idx_transactions_statement ON transactions(statement_id);
+-- Running totals per day / category / merchant, kept in step with transactions
+-- by add_statement / remove_statement so aggregates never rescan the history.
+CREATE TABLE IF NOT EXISTS daily_totals (
+    date          TEXT NOT NULL,
+    category      TEXT NOT NULL,
+    merchant      TEXT NOT NULL,
+    amount_cents  INTEGER NOT NULL,
+    outcome_cents INTEGER NOT NULL,     -- sum of amounts >= 0
+    refund_cents  INTEGER NOT NULL,     -- sum of amounts < 0
+    count         INTEGER NOT NULL,
+    PRIMARY KEY (date, category, merchant)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQL expression giving the period label of `date` for each analysis unit.
+# ISO weeks are computed from the Thursday of the week, as sqlite has no %V.
+_ISO_THURSDAY = "date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days', '+3 days')"
+PERIOD_SQL = {
+    'Day': "date",
+    'Week': (f"strftime('%Y', {_ISO_THURSDAY}) || '-W' || "
+             f"printf('%02d', (CAST(strftime('%j', {_ISO_THURSDAY}) AS INTEGER) - 1) / 7 + 1)"),
+    'Month': "strftime('%Y-%m', date)",
+    'Quarter': "strftime('%Y', date) || '-Q' || ((CAST(strftime('%m', date) AS INTEGER) + 2) / 3)",
+    'Year': "strftime('%Y', date)",
+}
+
+# First day of the period containing `date`, and the modifier that moves it to the next period
+_PERIOD_START_SQL = {
+    'Day': ("date", '+1 day'),
+    'Week': ("date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')", '+7 days'),
+    'Month': ("date(date, 'start of month')", '+1 month'),
+    'Quarter': ("date(date, 'start of month', '-' || ((CAST(strftime('%m', date) AS INTEGER) - 1) % 3) || ' months')",
+                '+3 months'),
+    'Year': ("date(date, 'start of year')", '+1 year'),
+}
+
+# Adds (sign = 1) or subtracts (sign = -1) transactions to / from daily_totals;
+# {rows} selects them, see _APPLY_TOTALS_SQL and _APPLY_ROW_TOTALS_SQL
+_APPLY_TOTALS_TEMPLATE = """
+INSERT INTO daily_totals (date, category, merchant, amount_cents, outcome_cents, refund_cents, count)
+SELECT date, category, merchant,
+       :sign * SUM(amount_cents), :sign * SUM(MAX(amount_cents, 0)), :sign * SUM(MIN(amount_cents, 0)), :sign * COUNT(*)
+FROM transactions WHERE {rows}
+GROUP BY date, category, merchant
+ON CONFLICT (date, category, merchant) DO UPDATE SET
+    amount_cents = amount_cents + excluded.amount_cents,
+    outcome_cents = outcome_cents + excluded.outcome_cents,
+    refund_cents = refund_cents + excluded.refund_cents,
+    count = count + excluded.count
+"""
+# the counted (not duplicate) rows of one statement
+_APPLY_TOTALS_SQL = _APPLY_TOTALS_TEMPLATE.format(rows="statement_id = :statement_id AND duplicate = 0")
+# rows by id, :ids a JSON list
+_APPLY_ROW_TOTALS_SQL = _APPLY_TOTALS_TEMPLATE.format(rows="id IN (SELECT value FROM json_each(:ids))")
+
+
+def _to_iso(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def _union_span(a, b):
+    # smallest (first, last) ISO date span covering both; None ends mean "no dates"
+    firsts = [d for d in (a[0], b[0]) if d is not None]
+    lasts = [d for d in (a[1], b[1]) if d is not None]
+    return (min(firsts) if firsts else None, max(lasts) if lasts else None)
+
+
+class Ledger:
+    """
+    Persistent store of every parsed transaction, backed by a local sqlite file.
+
+    Statements are registered once by their parse-cache key, transactions are
+    bulk-inserted with their normalized merchant and category, and the dashboard
+    reads back only the rows (or aggregates) of the period it shows.
+    Amounts are stored as integer cents so SQL sums are exact.
+
+    `version` changes on every write, for caches built on top of the ledger;
+    changed_dates() tells such a cache which dates a write touched.
+    """
+    def __init__(self, path='ledger.db', version=0):
+        """
+        :param version: First value of `version`; LedgerPool continues the count of a reopened file,
+                        so caches keyed on (path, version) never see an old version again.
+        """
+        self.path = path
+        self.version = version
+        # (version, first date, last date) of recent writes; dates are None for "everything"
+        self._changes = deque(maxlen=256)
+        self._lock = threading.RLock()
+        # Streamlit reruns happen on different threads; access is serialized by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # dedup keys of every stored transaction, loaded on the first add_statement
+        self._dedup = None
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        if self._get_meta('daily_totals') != '1':
+            # ledger written before daily_totals existed
+            with self._conn:
+                self._rebuild_totals()
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('daily_totals', '1')")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _migrate(self):
+        # columns added after the first ledger files were written
+        with self._conn:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(transactions)")}
+            if 'dedup_key' not in columns:
+                self._conn.execute("ALTER TABLE transactions ADD COLUMN dedup_key TEXT")
+            if 'duplicate' not in columns:
+                # duplicates used to be skipped, so every stored row is counted
+                self._conn.execute("ALTER TABLE transactions ADD COLUMN duplicate INTEGER NOT NULL DEFAULT 0")
+            missing = self._conn.execute(
+                "SELECT statement_id, id, date, amount_cents, raw_merchant FROM transactions "
+                "WHERE dedup_key IS NULL ORDER BY statement_id, id").fetchall()
+            for statement_id in sorted({row[0] for row in missing}):
+                rows = [row for row in missing if row[0] == statement_id]
+                keys = transaction_keys([r[2] for r in rows], [r[3] for r in rows], [r[4] for r in rows])
+                self._conn.executemany("UPDATE transactions SET dedup_key = ? WHERE id = ?",
+                                       zip(keys, [r[1] for r in rows]))
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_dedup ON transactions(dedup_key)")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(statements)")}
+            if 'account' not in columns:
+                self._conn.execute("ALTER TABLE statements ADD COLUMN account TEXT")
+            if 'duplicate_count' not in columns:
+                self._conn.execute("ALTER TABLE statements ADD COLUMN duplicate_count INTEGER NOT NULL DEFAULT 0")
+            if 'parser_version' not in columns:
+                self._conn.execute("ALTER TABLE statements ADD COLUMN parser_version TEXT")
+                # statements used to be keyed by the ParseCache key "<sha256>-v<parser version>",
+                # so a PDF uploaded again after a parser update was stored twice: keep the first copy
+                stored = set()
+                for statement_id, key in self._conn.execute(
+                        "SELECT id, content_key FROM statements WHERE content_key LIKE '%-v%' ORDER BY id").fetchall():
+                    digest, _, version = key.rpartition('-v')
+                    if digest in stored:
+                        self._delete_statement(statement_id)
+                        continue
+                    stored.add(digest)
+                    self._conn.execute("UPDATE statements SET content_key = ?, parser_version = ? WHERE id = ?",
+                                       (digest, version, statement_id))
+
+    def _dedup_index(self):
+        if self._dedup is None:
+            self._dedup = DedupIndex(row[0] for row in self._conn.execute(
+                "SELECT dedup_key FROM transactions WHERE duplicate = 0"))
+        return self._dedup
+
+    # --- statements ---
+
+    def find_statement(self, content_key):
+        """
+        :return: The id of the statement stored for `content_key`, or None.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM statements WHERE content_key = ?", (content_key,)).fetchone()
+        return None if row is None else row[0]
+
+    def statement_version(self, content_key):
+        """
+        :return: The parser version a stored statement was parsed with ('' if unknown),
+                 or None if the statement is not stored.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT parser_version FROM statements WHERE content_key = ?",
+                                     (content_key,)).fetchone()
+        return None if row is None else (row[0] or '')
+
+    def add_statement(self, source, content_key, df, normalizer=None, categorizer=None, replace=False,
+                      parser_version=None):
+        """
+        Stores one parsed statement and adds its rows to the running totals.
+
+        Rows whose dedup key (date, amount, merchant, card, repeat number) is
+        already in the ledger, e.g. from an overlapping monthly and quarterly
+        statement, are stored as duplicates: kept with the statement but left
+        out of the totals and queries, and counted in its duplicate_count. When
+        the statement holding the counted copy is removed or re-parsed, a
+        duplicate from another statement takes its place (see _delete_statement).
+        start_date / end_date span all dated rows of the statement; row_count
+        and duplicate_count are its counted and duplicate rows.
+
+        :param source: Display name of the statement, usually the file name.
+        :param content_key: SHA-256 of the PDF; a statement already stored is skipped.
+        :param df: Extracted transactions with Date, Merchant and Cents (or dollar Amount) columns;
+                   df.attrs['account'] (set by the parser) identifies the card.
+        :param normalizer: Optional MerchantNormalizer for the merchant column.
+        :param categorizer: Optional Categorizer for the category column.
+        :param replace: Re-parse: replace the rows of an already stored statement instead of skipping it.
+        :param parser_version: Parser version of `df`, see statement_version().
+        :return: The statement id.
+        """
+        account = df.attrs.get('account')
+        if df.empty:
+            dates = merchants = normalized = categories = pd.Series([], dtype=object)
+            cents = []
+        else:
+            # rows without a date are dropped column by column, the frame itself is not copied
+            dated = df['Date'].notna()
+            everything = bool(dated.all())
+            dates = df['Date'] if everything else df['Date'][dated]
+            dates = dates.dt.strftime('%Y-%m-%d')
+            merchants = (df['Merchant'] if everything else df['Merchant'][dated]).astype(str)
+            normalized = normalizer.normalize_column(merchants) if normalizer is not None else merchants
+            categories = (categorizer.categorize(normalized) if categorizer is not None
+                          else pd.Series('Other', index=merchants.index))
+            cents = amount_cents(df)
+            cents = (cents if everything else cents[dated]).tolist()
+        dates, merchants = dates.tolist(), merchants.tolist()
+        normalized, categories = normalized.astype(str).tolist(), categories.astype(str).tolist()
+        keys = transaction_keys(dates, cents, merchants, account)
+
+        with self._lock, self._conn:
+            existing = self._conn.execute("SELECT id FROM statements WHERE content_key = ?", (content_key,)).fetchone()
+            if existing and not replace:
+                return existing[0]
+            if existing:
+                removed_span = self._delete_statement(existing[0])
+            index = self._dedup_index()
+            duplicate = [int(not new) for new in index.new_rows(keys)]
+            counted = len(keys) - sum(duplicate)
+            # the span of the whole statement, also when all of its rows were duplicates
+            first, last = (min(dates), max(dates)) if dates else (None, None)
+            cursor = self._conn.execute(
+                "INSERT INTO statements (source, content_key, start_date, end_date, row_count, added_at, "
+                "account, duplicate_count, parser_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, content_key, first, last, counted, datetime.now().isoformat(timespec='seconds'),
+                 account, len(keys) - counted, parser_version))
+            statement_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO transactions (statement_id, date, raw_merchant, merchant, category, amount_cents, "
+                "dedup_key, duplicate) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((statement_id,) + row for row in zip(dates, merchants, normalized, categories, cents, keys, duplicate)))
+            self._conn.execute(_APPLY_TOTALS_SQL, {'sign': 1, 'statement_id': statement_id})
+            index.add(key for key, dup in zip(keys, duplicate) if not dup)
+            if existing:
+                first, last = _union_span((first, last), removed_span)
+            self._log_change(first, last)
+        return statement_id
+
+    def remove_statement(self, statement_id):
+        """
+        Deletes a statement with its transactions and subtracts them from the running totals.
+        """
+        with self._lock, self._conn:
+            self._log_change(*self._delete_statement(statement_id))
+
+    def _delete_statement(self, statement_id):
+        # caller holds the lock and the transaction; returns the (first, last) dates removed.
+        # For each counted row, the oldest duplicate of it in another statement (if any) is
+        # promoted: counted from now on and added back to the totals.
+        span = self._conn.execute("SELECT start_date, end_date FROM statements WHERE id = ?", (statement_id,)).fetchone()
+        self._conn.execute(_APPLY_TOTALS_SQL, {'sign': -1, 'statement_id': statement_id})
+        counted_keys = [row[0] for row in self._conn.execute(
+            "SELECT dedup_key FROM transactions WHERE statement_id = ? AND duplicate = 0", (statement_id,))]
+        promoted = [row[0] for row in self._conn.execute(
+            "SELECT MIN(id) FROM transactions WHERE duplicate = 1 AND statement_id != ? AND dedup_key IN "
+            "(SELECT dedup_key FROM transactions WHERE statement_id = ? AND duplicate = 0) GROUP BY dedup_key",
+            (statement_id, statement_id))]
+        self._conn.execute("DELETE FROM statements WHERE id = ?", (statement_id,))
+        if promoted:
+            ids = json.dumps(promoted)
+            self._conn.execute("UPDATE transactions SET duplicate = 0 WHERE id IN (SELECT value FROM json_each(?))",
+                               (ids,))
+            self._conn.execute(_APPLY_ROW_TOTALS_SQL, {'sign': 1, 'ids': ids})
+            self._conn.execute(
+                "UPDATE statements SET row_count = row_count + p.n, duplicate_count = duplicate_count - p.n "
+                "FROM (SELECT statement_id, COUNT(*) AS n FROM transactions "
+                "      WHERE id IN (SELECT value FROM json_each(?)) GROUP BY statement_id) AS p "
+                "WHERE statements.id = p.statement_id", (ids,))
+        if span and span[0] is not None:
+            self._conn.execute("DELETE FROM daily_totals WHERE date BETWEEN ? AND ? AND count = 0", span)
+        if self._dedup is not None:
+            # promoted keys are still counted, by their new row
+            self._dedup.discard(counted_keys)
+            self._dedup.add(row[0] for row in self._conn.execute(
+                "SELECT dedup_key FROM transactions WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(promoted),)))
+        return tuple(span) if span else (None, None)
+
+    def _rebuild_totals(self):
+        self._conn.execute("DELETE FROM daily_totals")
+        self._conn.execute(
+            "INSERT INTO daily_totals (date, category, merchant, amount_cents, outcome_cents, refund_cents, count) "
+            "SELECT date, category, merchant, SUM(amount_cents), SUM(MAX(amount_cents, 0)), "
+            "SUM(MIN(amount_cents, 0)), COUNT(*) FROM transactions WHERE duplicate = 0 "
+            "GROUP BY date, category, merchant")
+
+    def _log_change(self, first, last, everything=False):
+        self.version += 1
+        self._changes.append((self.version, first, last, everything))
+
+    def changed_dates(self, since_version):
+        """
+        Which dates were touched by the writes after `since_version`.
+
+        :return: (first, last) ISO dates, (None, None) if no transaction changed,
+                 or None if unknown or everything may have changed (e.g. relabeling).
+        """
+        with self._lock:
+            if since_version == self.version:
+                return None, None
+            if since_version > self.version or not self._changes or self._changes[0][0] > since_version + 1:
+                return None
+            span = (None, None)
+            for version, first, last, everything in self._changes:
+                if version <= since_version:
+                    continue
+                if everything:
+                    return None
+                span = _union_span(span, (first, last))
+            return span
+
+    def statements(self):
+        """
+        :return: DataFrame of stored statements (id, source, content_key, start_date, end_date,
+                 row_count, account, duplicate_count, parser_version).
+        """
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT id, source, content_key, start_date, end_date, row_count, account, duplicate_count, "
+                "parser_version FROM statements ORDER BY start_date, id",
+                self._conn)
+
+    def statement_frame(self, statement_id):
+        """
+        :return: The transactions of one statement as Date / Merchant / Category / Cents,
+                 in the compact schema of frames.py.
+        """
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT date AS Date, merchant AS Merchant, category AS Category, amount_cents AS Cents "
+                "FROM transactions WHERE statement_id = ? ORDER BY date, id",
+                self._conn, params=(statement_id,), dtype={'Cents': 'int64'})
+        return compact_transactions(df)
+
+    # --- queries ---
+
+    def iter_transactions(self, start_date, end_date, chunk_rows=50000):
+        """
+        Transactions dated within [start_date, end_date] with the name of their statement,
+        in date order, one DataFrame of at most `chunk_rows` rows at a time.
+
+        Each chunk is its own keyset query (continuing after the last date / id read),
+        so the lock is not held between chunks and the full result is never in memory.
+
+        :return: A generator of DataFrames with Date, Merchant, Category, Cents and Source,
+                 in the compact schema of frames.py.
+        """
+        start_date, end_date = _to_iso(start_date), _to_iso(end_date)
+        after = (start_date, 0)
+        while True:
+            with self._lock:
+                df = pd.read_sql_query(
+                    "SELECT t.date AS Date, t.merchant AS Merchant, t.category AS Category, "
+                    "t.amount_cents AS Cents, s.source AS Source, t.id AS id "
+                    "FROM transactions t JOIN statements s ON s.id = t.statement_id "
+                    "WHERE t.date BETWEEN ? AND ? AND (t.date, t.id) > (?, ?) AND t.duplicate = 0 "
+                    "ORDER BY t.date, t.id LIMIT ?",
+                    self._conn, params=(after[0], end_date, *after, chunk_rows), dtype={'Cents': 'int64'})
+            if df.empty:
+                return
+            after = (df['Date'].iat[-1], int(df['id'].iat[-1]))
+            yield compact_transactions(df.drop(columns='id'))
+            if len(df) < chunk_rows:
+                return
+
+    def aggregate(self, start_date, end_date, unit='Month', by=('category',)):
+        """
+        Sums amounts per period (and per `by` columns) inside sqlite.
+
+        :param unit: One of PERIOD_SQL: 'Day', 'Week', 'Month', 'Quarter' or 'Year'.
+        :param by: Extra grouping columns, any of 'category' and 'merchant'.
+        :return: DataFrame with Period and the `by` columns (capitalized) as categoricals,
+                 and integer Cents, OutcomeCents (sum of amounts >= 0), RefundCents
+                 (sum of amounts < 0) and Count.
+        """
+        if unit not in PERIOD_SQL:
+            raise ValueError(f"Unknown unit {unit!r}, expected one of {list(PERIOD_SQL)}")
+        for column in by:
+            if column not in ('category', 'merchant'):
+                raise ValueError(f"Cannot group by {column!r}")
+        group_cols = ''.join(f", {column} AS {column.capitalize()}" for column in by)
+        group_by = ''.join(f", {column}" for column in by)
+        # read from the running totals: one row per day / category / merchant instead of per transaction
+        sql = (f"SELECT {PERIOD_SQL[unit]} AS Period{group_cols}, "
+               f"SUM(amount_cents) AS Cents, "
+               f"SUM(outcome_cents) AS OutcomeCents, SUM(refund_cents) AS RefundCents, "
+               f"SUM(count) AS Count "
+               f"FROM daily_totals WHERE date BETWEEN ? AND ? "
+               f"GROUP BY Period{group_by} ORDER BY Period{group_by}")
+        with self._lock:
+            cells = pd.read_sql_query(sql, self._conn, params=(_to_iso(start_date), _to_iso(end_date)),
+                                      dtype={'Cents': 'int64', 'OutcomeCents': 'int64',
+                                             'RefundCents': 'int64', 'Count': 'int64'})
+        return compact_cells(cells)
+
+    def period_span(self, start_date, end_date, unit):
+        """
+        The whole periods of `unit` overlapping [start_date, end_date].
+
+        :return: (first label, last label, first day, last day), labels as in aggregate().
+        """
+        start_sql, step = _PERIOD_START_SQL[unit]
+        sql = (f"SELECT (SELECT {PERIOD_SQL[unit]} FROM (SELECT :start AS date)), "
+               f"(SELECT {PERIOD_SQL[unit]} FROM (SELECT :end AS date)), "
+               f"(SELECT {start_sql} FROM (SELECT :start AS date)), "
+               f"(SELECT date({start_sql}, '{step}', '-1 day') FROM (SELECT :end AS date))")
+        with self._lock:
+            return self._conn.execute(sql, {'start': _to_iso(start_date), 'end': _to_iso(end_date)}).fetchone()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM transactions WHERE duplicate = 0").fetchone()[0]
+
+    # --- derived columns ---
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def refresh_labels(self, normalizer, categorizer, labels_key):
+        """
+        Recomputes merchant and category for all rows when the configs changed.
+
+        :param labels_key: Any string identifying the merchant map + category config
+                           contents; nothing is done if it matches the last refresh.
+        :return: True if the labels were recomputed.
+        """
+        with self._lock:
+            if self._get_meta('labels_key') == labels_key:
+                return False
+            with self._conn:
+                raw = [row[0] for row in self._conn.execute("SELECT DISTINCT raw_merchant FROM transactions")]
+                if raw:
+                    merchants = normalizer.normalize_column(pd.Series(raw)) if normalizer is not None else pd.Series(raw)
+                    categories = categorizer.categorize(merchants) if categorizer is not None else pd.Series('Other', index=merchants.index)
+                    self._conn.executemany(
+                        "UPDATE transactions SET merchant = ?, category = ? WHERE raw_merchant = ?",
+                        zip(merchants.astype(str).tolist(), categories.astype(str).tolist(), raw))
+                    self._rebuild_totals()
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('labels_key', ?)", (labels_key,))
+                self._log_change(None, None, everything=True)
+        return True
+
+
+class LedgerPool:
+    """
+    Open Ledgers by path, for a server with one ledger file per session.
+
+    Every open Ledger holds a sqlite connection and, once written to, the dedup
+    keys of all its rows, so at most `max_open` are kept: past that the least
+    recently used one is closed, provided it has been idle for `min_idle`
+    seconds (a script run or ingest still using it is never cut off). A closed
+    ledger is reopened by the next get().
+    """
+    def __init__(self, max_open=32, min_idle=60.0):
+        self.max_open = max_open
+        self.min_idle = min_idle
+        # path -> (Ledger, last get() time), least recently used first
+        self._open = OrderedDict()
+        # path -> version of ledgers closed by the pool
+        self._closed_versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            entry = self._open.pop(path, None)
+            ledger = entry[0] if entry is not None else Ledger(path, self._closed_versions.pop(path, 0))
+            now = time.monotonic()
+            self._open[path] = (ledger, now)
+            while len(self._open) > self.max_open:
+                oldest, (idle_ledger, used) = next(iter(self._open.items()))
+                if now - used < self.min_idle:
+                    break
+                del self._open[oldest]
+                self._closed_versions[oldest] = idle_ledger.version + 1
+                idle_ledger.close()
+            return ledger
+
+    def __len__(self):
+        return len(self._open)
+
+    def close(self):
+        with self._lock:
+            for ledger, _ in self._open.values():
+                ledger.close()
+            self._open.clear()
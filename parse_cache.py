@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from general_pdf_extrract import PARSER_VERSION
+
+
+class ParseCache:
+    """
+    Cache of parsed statements, shared by every session of a server.
+
+    Entries are keyed by the SHA-256 of the PDF bytes plus the parser version and
+    stored as Parquet files, so a statement is parsed once and later reruns just
+    read the frame back. When the directory grows past `max_bytes` the least
+    recently used entries (by file mtime, refreshed on every hit) are evicted.
+
+    With `max_memory_bytes`, recently used frames are also kept in memory (an
+    LRU bounded by their deep size), so the same statement uploaded by several
+    sessions is not even read back from disk. Hits and misses are counted per
+    tier, see stats().
+    """
+    def __init__(self, directory='.parse_cache', max_bytes=256 * 1024 * 1024, max_memory_bytes=0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        # key -> (frame, size in bytes), least recently used first
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(pdf_bytes):
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        return f"{digest}-v{PARSER_VERSION}"
+
+    @staticmethod
+    def split_key(key):
+        """
+        :return: (SHA-256 of the PDF, parser version) of a key built by key().
+        """
+        digest, _, version = key.rpartition('-v')
+        return digest, version
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def get(self, key):
+        """
+        Returns the cached DataFrame for `key`, or None on a miss.
+        """
+        import pandas as pd
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                # a shallow copy, so a caller adding columns does not change the cached frame
+                return entry[0].copy(deep=False)
+
+        path = self.path(key)
+        try:
+            df = pd.read_parquet(path)
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        # Touch the entry so eviction sees it as recently used; it may have been
+        # evicted meanwhile, the frame is already read
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(key, df)
+        return df.copy(deep=False)
+
+    def put(self, key, df):
+        """
+        Stores `df` under `key` and evicts old entries if over the size limit.
+        """
+        path = self.path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._remember(key, df)
+        self.evict()
+
+    def get_or_parse(self, pdf_bytes, parse):
+        """
+        Returns the cached frame for `pdf_bytes`, calling `parse()` to build it on a miss.
+        """
+        key = self.key(pdf_bytes)
+        df = self.get(key)
+        if df is None:
+            df = parse()
+            self.put(key, df)
+        return df
+
+    def _remember(self, key, df):
+        # keeps `df` in the memory tier, evicting the least recently used frames past the cap
+        if not self.max_memory_bytes:
+            return
+        from frames import object_nbytes
+
+        size = object_nbytes(df)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= old[1]
+            self._memory[key] = (df, size)
+            self._memory_size += size
+            while self._memory_size > self.max_memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_size -= evicted
+                self.memory_evictions += 1
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        # Oldest first
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                with self._lock:
+                    self.disk_evictions += 1
+            total -= size
+
+    def disk_bytes(self):
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.parquet'):
+                try:
+                    total += entry.stat().st_size
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def nbytes(self):
+        # memory held by the in-memory tier
+        return self._memory_size
+
+    def stats(self):
+        """
+        :return: dict with the hit / miss counters, the hit rate and the size of both tiers.
+        """
+        disk_size = self.disk_bytes()
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'hit_rate': hits / lookups if lookups else None,
+                    'memory_evictions': self.memory_evictions, 'disk_evictions': self.disk_evictions,
+                    'memory_entries': len(self._memory), 'memory_mb': self._memory_size / 2**20,
+                    'memory_cap_mb': self.max_memory_bytes / 2**20, 'disk_mb': disk_size / 2**20,
+                    'disk_cap_mb': self.max_bytes / 2**20}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.parquet'):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,243 @@
+"""
+Parser registry: issuer-specific fast paths in front of the dynamic extractor.
+
+    from parsers import REGISTRY
+    df = REGISTRY.parse(lines, stats=stats)
+
+Each registered parser has a cheap detect() predicate that only looks at the
+statement header, and a parse() that extracts the transactions in one linear
+pass over the lines, with no pattern discovery. The first parser whose header
+matches handles the statement; if none does, or its output does not cover
+the statement's transactions (the layout changed), the statement goes to
+general_pdf_extrract.extract_transactions_dynamically.
+
+The registry also keeps per-parser throughput (statements, lines, rows and
+seconds), fed from the parse stats so parses in worker processes count too.
+"""
+import re
+import threading
+import time
+import instrument
+from general_pdf_extrract import (LINE_CLASSIFIER, LineClassifier, extract_transactions_dynamically,
+                                  find_statement_account, find_statement_year_and_span)
+
+# Lines of the header a detect() predicate looks at
+HEADER_LINES = 60
+
+_YEAR_RE = re.compile(r'\b(20\d{2}|19\d{2})\b')
+# "Statement period" (CIBC, Rogers) or "STATEMENT FROM DEC 07, 2024 TO JAN 06, 2025" (RBC)
+_PERIOD_RE = re.compile(r'period|statement from', re.IGNORECASE)
+_DATE_RE = re.compile(LineClassifier.DATE.format(space=r'\s'))
+
+
+def find_years_near_period_keyword(lines, window=5, max_lines=200):
+    """
+    The years printed around the first statement period line of the header, e.g.
+    "STATEMENT FROM DEC 12, 2023 TO JAN 11, 2024" -> (2023, 2024).
+
+    :return: (first year, last year), or None if there is no period line with a year nearby.
+    """
+    for idx, line in enumerate(lines[:max_lines]):
+        if _PERIOD_RE.search(line):
+            years = [int(year) for nearby in lines[max(0, idx - window):idx + window + 1]
+                     for year in _YEAR_RE.findall(nearby)]
+            if years:
+                return min(years), max(years)
+    return None
+
+
+class StatementParser:
+    """
+    Base class of an issuer-specific fast-path parser.
+
+    Subclasses set `name` and implement detect() and parse().
+    """
+    name = None
+
+    def detect(self, lines):
+        """
+        :param lines: The first HEADER_LINES lines of the statement.
+        :return: True if this parser knows the statement's layout.
+        """
+        raise NotImplementedError
+
+    def parse(self, lines, stats=None):
+        """
+        :return: (DataFrame in the compact schema of frames.py, coverage), where coverage is the
+                 share of the transaction start lines that became rows (1.0 = everything parsed).
+        """
+        raise NotImplementedError
+
+
+class TwoDateParser(StatementParser):
+    """
+    Credit card layouts where every transaction is
+
+        transaction date, posting date, description line(s), [reference number], amount
+
+    e.g. RBC (23-digit reference), CIBC (spend category as a second text line) and
+    Rogers (city / province). Derived from the first, RBC-only parser of the app.
+
+    Lines are labeled in one batch with LINE_CLASSIFIER, then walked once: a
+    DATE followed by a DATE opens a transaction, TEXT lines are the merchant,
+    ID_NUMBER lines are skipped and the next AMOUNT closes it. Payment rows
+    (THANK_YOU lines) are left out, like the dynamic extractor does.
+    """
+    def __init__(self, name, header_pattern):
+        """
+        :param header_pattern: Regex that identifies the issuer in one of the header lines.
+        """
+        self.name = name
+        self.header_re = re.compile(header_pattern, re.IGNORECASE)
+
+    def detect(self, lines):
+        return any(self.header_re.search(line) for line in lines)
+
+    def parse(self, lines, stats=None):
+        import pandas as pd
+        from frames import compact_transactions
+
+        years = find_years_near_period_keyword(lines)
+        if years is None:
+            year, spans_two_years = find_statement_year_and_span(lines)
+            years = (year, year + 1) if spans_two_years else (year, year)
+        if stats is not None:
+            stats.update(year=years[-1], spans_two_years=years[0] != years[-1])
+
+        labels = LINE_CLASSIFIER.classify_batch(lines)
+        dates, merchants, amounts = [], [], []
+        starts = 0
+        i, n = 0, len(lines)
+        while i < n - 1:
+            if labels[i] != 'DATE' or labels[i + 1] != 'DATE':
+                i += 1
+                continue
+            starts += 1
+            text = []
+            payment = False
+            j = i + 2
+            while j < n and labels[j] in ('TEXT', 'ID_NUMBER', 'THANK_YOU'):
+                if labels[j] == 'TEXT':
+                    text.append(lines[j])
+                elif labels[j] == 'THANK_YOU':
+                    payment = True
+                j += 1
+            if j == n or labels[j] != 'AMOUNT':
+                # not a transaction after all: continue from the next line
+                i += 1
+                continue
+            if payment:
+                starts -= 1
+            elif text:
+                date_str = _DATE_RE.match(lines[i]).group(0)
+                # a statement from December into January: December dates belong to the first year
+                year = years[0] if date_str[:3].upper() == 'DEC' else years[-1]
+                dates.append(f"{date_str} {year}")
+                merchants.append(' '.join(text))
+                amounts.append(float(lines[j].replace('$', '').replace(',', '')))
+            i = j + 1
+
+        df = pd.DataFrame({'Date': pd.to_datetime(pd.Series(dates, dtype=object), format="%b %d %Y", errors='coerce'),
+                           'Merchant': merchants, 'Amount': amounts})
+        coverage = len(dates) / starts if starts else 0.0
+        return compact_transactions(df), coverage
+
+
+class ParserRegistry:
+    """
+    Ordered list of fast-path parsers with the dynamic extractor as the fallback.
+    """
+    # below this coverage a fast-path result is discarded and the statement parsed dynamically
+    MIN_COVERAGE = 0.9
+
+    def __init__(self, parsers=()):
+        self.parsers = list(parsers)
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def register(self, parser, first=False):
+        """
+        Adds a parser; `first` puts it in front of the others (detect() order decides ties).
+        """
+        if first:
+            self.parsers.insert(0, parser)
+        else:
+            self.parsers.append(parser)
+        return parser
+
+    def detect(self, lines):
+        """
+        :return: The first parser that recognizes the header, or None.
+        """
+        header = lines[:HEADER_LINES]
+        return next((parser for parser in self.parsers if parser.detect(header)), None)
+
+    def parse(self, lines, stats=None, templates=None):
+        """
+        Extracts the transactions of one statement.
+
+        :param stats: Optional dict; besides what the parser fills in it gets 'parser'
+                      (the name of the parser used, 'dynamic' for the fallback),
+                      'lines', 'rows' and 'parse_seconds', see record().
+        :param templates: Passed on to the dynamic extractor.
+        :return: DataFrame with Date, Merchant and Cents (compact schema), df.attrs['account'] set.
+        """
+        stats = {} if stats is None else stats
+        start = time.perf_counter()
+        parser = self.detect(lines)
+        df = None
+        if parser is not None:
+            with instrument.stage(f"parser:{parser.name}"):
+                df, coverage = parser.parse(lines, stats)
+            if coverage >= self.MIN_COVERAGE:
+                df.attrs['account'] = find_statement_account(lines)
+                stats.update(parser=parser.name, lines=len(lines), pattern=None, coverage=coverage,
+                             account=df.attrs['account'])
+            else:
+                df = None
+        if df is None:
+            with instrument.stage('parser:dynamic'):
+                df = extract_transactions_dynamically(lines, stats=stats, templates=templates)
+            stats['parser'] = 'dynamic'
+        stats.update(rows=len(df), parse_seconds=time.perf_counter() - start)
+        return df
+
+    def record(self, stats):
+        """
+        Adds one parse (the stats filled by parse()) to the throughput counters.
+        """
+        name = stats.get('parser')
+        if name is None:
+            return
+        with self._lock:
+            totals = self._totals.setdefault(name, [0, 0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += stats.get('lines') or 0
+            totals[2] += stats.get('rows') or 0
+            totals[3] += stats.get('parse_seconds') or 0.0
+
+    def throughput(self):
+        """
+        :return: DataFrame with Parser, Statements, Lines, Rows, Seconds, Lines/s and Rows/s.
+        """
+        import pandas as pd
+
+        with self._lock:
+            totals = {name: list(values) for name, values in self._totals.items()}
+        rows = [{'Parser': name, 'Statements': count, 'Lines': lines, 'Rows': n_rows, 'Seconds': round(seconds, 4),
+                 'Lines/s': round(lines / seconds) if seconds else None,
+                 'Rows/s': round(n_rows / seconds) if seconds else None}
+                for name, (count, lines, n_rows, seconds) in totals.items()]
+        columns = ['Parser', 'Statements', 'Lines', 'Rows', 'Seconds', 'Lines/s', 'Rows/s']
+        return pd.DataFrame(rows, columns=columns)
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+REGISTRY = ParserRegistry([
+    TwoDateParser('rbc', r'\bRBC\b|Royal Bank of Canada'),
+    TwoDateParser('cibc', r'\bCIBC\b'),
+    TwoDateParser('rogers', r'\bRogers Bank\b'),
+])
@@ -0,0 +1,55 @@
+from datetime import datetime
+from category import JsonStore
+
+
+class TemplateRegistry(JsonStore):
+    """
+    Learned statement layouts, keyed by general_pdf_extrract.layout_fingerprint.
+
+    Each template remembers the transaction pattern that pattern discovery chose
+    for that layout and how much of the statement it covered, so the next
+    statement from the same issuer goes straight to the extraction pass:
+
+        {"<fingerprint>": {"pattern": ["DATE", "DATE", "TEXT", "ID_NUMBER", "AMOUNT"],
+                           "coverage": 0.98, "uses": 12, "learned_at": "..."}}
+
+    The parser only reads a plain dict snapshot (`templates`), so it can run in
+    worker processes; learned or re-learned templates come back through the
+    parse stats and are stored here with record().
+    """
+    def __init__(self, filepath='templates.json'):
+        self.templates = {}
+        super().__init__(filepath)
+
+    def _get_data(self):
+        return self.templates
+
+    def _set_data(self, data):
+        self.templates = data
+
+    def get(self, fingerprint):
+        return self.templates.get(fingerprint)
+
+    def record(self, stats):
+        """
+        Stores the outcome of one parse.
+        :param stats: The stats dict filled by extract_transactions_dynamically.
+        """
+        status, fingerprint = stats.get('template'), stats.get('layout')
+        if fingerprint is None or stats.get('pattern') is None:
+            return
+        if status in ('learned', 'relearned'):
+            self.templates[fingerprint] = {
+                'pattern': list(stats['pattern']),
+                'coverage': round(stats['coverage'], 4),
+                'uses': 1,
+                'learned_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            self._changed()
+        elif status == 'hit' and fingerprint in self.templates:
+            # counted in memory only, a save per statement is not worth it
+            self.templates[fingerprint]['uses'] = self.templates[fingerprint].get('uses', 0) + 1
+
+    def forget(self, fingerprint):
+        if self.templates.pop(fingerprint, None) is not None:
+            self._changed()
@@ -0,0 +1,33 @@
+import random
+import pandas as pd
+import pytest
+from category import Categorizer
+from ledger import Ledger
+
+MERCHANTS = ['STARBUCKS #123', 'UBER TRIP', 'AMAZON PRIME', 'REAL CDN SUPERSTORE', 'PAYMENT THANK YOU']
+CATEGORIES = {'Dining': ['starbucks'], 'Transportation': ['uber'], 'Subscription': ['amazon'],
+              'Supermarket': ['superstore']}
+
+
+def make_statement(seed, start, days, rows):
+    """
+    A parsed statement as the extractors return it: Date, Merchant and Amount,
+    `rows` transactions spread over `days` days from `start`.
+    """
+    rnd = random.Random(seed)
+    start = pd.Timestamp(start)
+    records = [(start + pd.Timedelta(days=rnd.randrange(days)), rnd.choice(MERCHANTS),
+                round(rnd.uniform(-50, 300), 2)) for _ in range(rows)]
+    return pd.DataFrame(records, columns=['Date', 'Merchant', 'Amount'])
+
+
+@pytest.fixture
+def categorizer():
+    return Categorizer(CATEGORIES)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = Ledger(str(tmp_path / 'ledger.db'))
+    yield ledger
+    ledger.close()
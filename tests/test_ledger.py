@@ -0,0 +1,88 @@
+import random
+import pandas as pd
+from aggregates import build_cube, update_cube
+from conftest import make_statement
+
+
+def daily_totals(ledger):
+    return ledger._conn.execute("SELECT * FROM daily_totals ORDER BY date, category, merchant").fetchall()
+
+
+def assert_totals_consistent(ledger):
+    # the incrementally maintained totals equal a rebuild from the counted rows
+    incremental = daily_totals(ledger)
+    with ledger._conn:
+        ledger._rebuild_totals()
+    assert incremental == daily_totals(ledger)
+
+
+def test_daily_totals_round_trip(ledger, categorizer):
+    rnd = random.Random(7)
+    stored = {}
+    for step in range(60):
+        if stored and rnd.random() < 0.35:
+            ledger.remove_statement(stored.pop(rnd.choice(list(stored))))
+        else:
+            month = rnd.randrange(6)
+            df = make_statement(month * 100 + rnd.randrange(3), pd.Timestamp('2024-01-01') + pd.DateOffset(months=month),
+                                45, rnd.randrange(0, 40))
+            key = f'statement-{month}'
+            stored[key] = ledger.add_statement(f'{key}.pdf', key, df, categorizer=categorizer,
+                                               replace=key in stored)
+        assert_totals_consistent(ledger)
+    for statement_id in list(stored.values()):
+        ledger.remove_statement(statement_id)
+    assert daily_totals(ledger) == []
+    assert len(ledger) == 0
+
+
+def test_removed_duplicates_are_promoted(ledger, categorizer):
+    shared = make_statement(1, '2024-03-01', 28, 30).drop_duplicates(['Date', 'Merchant', 'Amount'])
+    own = make_statement(2, '2024-04-01', 28, 50)
+    quarterly = pd.concat([shared, own], ignore_index=True)
+
+    monthly_id = ledger.add_statement('march.pdf', 'march', shared, categorizer=categorizer)
+    quarterly_id = ledger.add_statement('q1.pdf', 'q1', quarterly, categorizer=categorizer)
+    counts = ledger.statements().set_index('id')
+    assert counts.loc[quarterly_id, 'duplicate_count'] == len(shared)
+    assert counts.loc[quarterly_id, 'row_count'] == len(own)
+    assert len(ledger) == len(quarterly)
+    assert_totals_consistent(ledger)
+
+    ledger.remove_statement(monthly_id)
+    counts = ledger.statements().set_index('id')
+    assert counts.loc[quarterly_id, 'row_count'] == len(quarterly)
+    assert counts.loc[quarterly_id, 'duplicate_count'] == 0
+    assert len(ledger) == len(quarterly)
+    assert_totals_consistent(ledger)
+
+    # storing the month again finds every row already counted
+    monthly_id = ledger.add_statement('march.pdf', 'march', shared, categorizer=categorizer)
+    assert ledger.statements().set_index('id').loc[monthly_id, 'duplicate_count'] == len(shared)
+    assert len(ledger) == len(quarterly)
+    assert_totals_consistent(ledger)
+
+
+def test_update_cube_matches_build_cube(ledger, categorizer):
+    rnd = random.Random(3)
+    start, end = '2023-01-01', '2025-12-31'
+    cubes = {unit: build_cube(ledger, start, end, unit) for unit in ('Week', 'Month', 'Year')}
+    stored = {}
+    for step in range(30):
+        version = ledger.version
+        if stored and rnd.random() < 0.3:
+            ledger.remove_statement(stored.pop(rnd.choice(list(stored))))
+        else:
+            month = rnd.randrange(24)
+            df = make_statement(step, pd.Timestamp('2024-01-01') + pd.DateOffset(months=month), 31, 25)
+            key = f'statement-{month}'
+            stored[key] = ledger.add_statement(f'{key}.pdf', key, df, categorizer=categorizer,
+                                               replace=key in stored)
+        first, last = ledger.changed_dates(version)
+        for unit, cube in cubes.items():
+            if first is not None:
+                cube = update_cube(cube, ledger, start, end, first, last)
+            expected = build_cube(ledger, start, end, unit)
+            pd.testing.assert_frame_equal(cube.cells, expected.cells)
+            assert cube.totals() == expected.totals()
+            cubes[unit] = cube
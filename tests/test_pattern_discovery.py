@@ -0,0 +1,56 @@
+import random
+from collections import Counter
+import pytest
+from general_pdf_extrract import (FINGERPRINT_CODES, PATTERN_LENGTHS, discover_pattern_from_codes,
+                                  encode_fingerprints, find_statement_account)
+
+
+def discover_with_counter(fingerprints):
+    # the original pure-Python discovery: count every qualifying window, the last of the most common wins
+    pattern_counts = Counter()
+    for length in PATTERN_LENGTHS:
+        for i in range(len(fingerprints) - length + 1):
+            pattern = tuple(fingerprints[i : i + length])
+            if pattern[0] == 'DATE' and 'AMOUNT' in pattern and 'TEXT' in pattern:
+                pattern_counts[pattern] += 1
+    if not pattern_counts:
+        return None
+    max_count = pattern_counts.most_common(1)[0][1]
+    return [p for p, c in pattern_counts.items() if c == max_count][-1]
+
+
+def random_fingerprints(rnd):
+    labels = list(FINGERPRINT_CODES)
+    fingerprints = []
+    for _ in range(rnd.randrange(0, 120)):
+        if rnd.random() < 0.5:
+            # a transaction-like run, so most sequences have a pattern
+            fingerprints += ['DATE', 'TEXT'] + ['TEXT'] * (rnd.random() < 0.3) + ['AMOUNT']
+        else:
+            fingerprints.append(rnd.choice(labels))
+    return fingerprints
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_discovery_matches_counter(seed):
+    fingerprints = random_fingerprints(random.Random(seed))
+    assert discover_pattern_from_codes(encode_fingerprints(fingerprints)) == discover_with_counter(fingerprints)
+
+
+def test_discovery_without_transactions():
+    assert discover_pattern_from_codes(encode_fingerprints(['TEXT', 'AMOUNT', 'TEXT'])) is None
+
+
+@pytest.mark.parametrize('line, last4', [
+    ('4510 12** **** 3456', '3456'),
+    ('XXXX XXXX XXXX 1234', '1234'),
+    ('**** **** **** 1234', '1234'),
+    ('•••• •••• •••• 1234', '1234'),
+    ('Card number: **** **** **** 9876', '9876'),
+    ('xxxx-xxxx-xxxx-5555', '5555'),
+    ('Visa ending in 7777', '7777'),
+    ('Account 1234 5678 9012 3456', None),
+    ('Reference A***********1234', None),
+])
+def test_statement_account(line, last4):
+    assert find_statement_account(['Statement', line]) == last4
@@ -1,9 +1,15 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import io
 import streamlit as st
-from datetime import datetime
-from category import MerchantMap, CategoryConfig
-import re
+from ledger import PERIOD_SQL
+from category import MerchantMap, CategoryConfig, Categorizer, MerchantNormalizer
+import instrument
+from aggregates import AggregateCube
+
+
+def _pyplot():
+    # matplotlib is the slowest import of the dashboard, load it when the first chart is drawn
+    import matplotlib.pyplot as plt
+    return plt
 
 
 # 加载配置
@@ -11,73 +17,104 @@ merchant_map = MerchantMap('merchant_map.json')
 category_cfg = CategoryConfig('category.json')
 
 
-def match_category(df: pd.DataFrame, category_patterns: dict):
-    df_copy = df.copy()
-    df_copy['Category'] = 'Other'
-    for cat, patterns in category_patterns.items():
-        regex = re.compile('|'.join(patterns), re.IGNORECASE)
-        mask = df_copy['Merchant'].astype(str).str.contains(regex)
-        df_copy.loc[mask, 'Category'] = cat
-    return df_copy
+_categorizer_cache = {}
 
-def display_overall_summary(filtered_df: pd.DataFrame):
-    if filtered_df.empty:
-        st.info('No data in this period')
+def get_categorizer(categories):
+    """
+    Returns a Categorizer, rebuilt only when the categories change.
+    :param categories: A CategoryConfig (tracked by its version) or a plain {category: [patterns]} dict.
+    """
+    if isinstance(categories, CategoryConfig):
+        categories.reload_if_changed()
+        key = (id(categories), categories.version)
+        categories = categories.categories
     else:
-        col_a, col_b, col_c = st.columns(3)
-        col_a.metric("Total Refund", f"${-filtered_df[filtered_df['Amount'] < 0]['Amount'].sum():.2f}")
-        col_b.metric("Total Outcome", f"${filtered_df[filtered_df['Amount'] >= 0]['Amount'].sum():.2f}")
-        col_c.metric("Net Spend", f"${filtered_df['Amount'].sum():.2f}")
-        
-        df_list_matched = match_category(filtered_df, category_cfg.categories)
-        sums = df_list_matched.groupby('Category')['Amount'].sum()
+        key = tuple((cat, tuple(patterns)) for cat, patterns in categories.items())
+    categorizer = _categorizer_cache.get(key)
+    if categorizer is None:
+        _categorizer_cache.clear()
+        categorizer = _categorizer_cache[key] = Categorizer(categories)
+    return categorizer
+
+_normalizer_cache = {}
+
+def get_normalizer(merchant_map: MerchantMap):
+    # Rebuild the variant trie only when the merchant map changes
+    merchant_map.reload_if_changed()
+    key = (id(merchant_map), merchant_map.version)
+    normalizer = _normalizer_cache.get(key)
+    if normalizer is None:
+        _normalizer_cache.clear()
+        normalizer = _normalizer_cache[key] = MerchantNormalizer(merchant_map.map)
+    return normalizer
+
+def _figure_png(fig):
+    # rendered once per cube; st.image then just ships the bytes on later reruns
+    plt = _pyplot()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+def _pie_png(sums):
+    with instrument.stage('render_pie'):
         percentages = sums / sums.sum()
         label_with_percentages = [f"{label} ({percentage:.1%})" for label, percentage in zip(sums.index, percentages)]
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(5, 5))  
         ax.pie(sums, labels=label_with_percentages, startangle=90, textprops={'fontsize': 16})
         ax.axis('equal')
-        st.pyplot(fig)
+        return _figure_png(fig)
+
+def display_overall_summary(cube: AggregateCube):
+    if cube is None or cube.empty:
+        st.info('No data in this period')
+    else:
+        totals = cube.totals()
+        col_a, col_b, col_c = st.columns(3)
+        col_a.metric("Total Refund", f"${-totals['refund']:.2f}")
+        col_b.metric("Total Outcome", f"${totals['outcome']:.2f}")
+        col_c.metric("Net Spend", f"${totals['net']:.2f}")
+
+        st.image(cube.memo('pie_png', lambda: _pie_png(cube.category_totals())), use_container_width=True)
         
-def favorite_stores(filtered_df):
-    if filtered_df.empty:
+def favorite_stores(cube: AggregateCube):
+    if cube is None or cube.empty:
         st.info('No data in this period')
     else:
-        df_grouped = filtered_df.groupby('Merchant')['Amount'].sum()
-        df_grouped = df_grouped.sort_values(ascending=False)
-        st.dataframe(df_grouped)
-
-def plot_linear_spending(spend_date_list, spend_list):
-    fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(spend_date_list, spend_list, marker='o')
-    ax.axhline(0, color='gray', linestyle='--')
-    ax.set_title("Net Spending")
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Amount ($)")
-    ax.grid(True)
-    plt.xticks(rotation=45)
-    st.pyplot(fig)
-
-def plot_net_spend(df_list_in_unit):
+        st.dataframe(cube.merchant_totals())
+
+def _line_chart_png(spend_date_list, spend_list):
+    with instrument.stage('render_line_chart'):
+        plt = _pyplot()
+        fig, ax = plt.subplots(figsize=(10, 4))
+        ax.plot(spend_date_list, spend_list, marker='o')
+        ax.axhline(0, color='gray', linestyle='--')
+        ax.set_title("Net Spending")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Amount ($)")
+        ax.grid(True)
+        plt.xticks(rotation=45)
+        return _figure_png(fig)
+
+def plot_linear_spending(cube: AggregateCube):
     """
-    合并df_list，使用正则对Category进行模糊匹配归类，输出每个Category的净支出表格。
-    :param df_list: List[pd.DataFrame]，每个df需有'Merchant'和'Amount'列
-    :param category_patterns: dict, {category: [pattern1, pattern2, ...]}
-    :return: pd.DataFrame, columns=['Category', 'Net Spend']
+    Net spend per period of the cube's unit as a line chart.
     """
+    def render():
+        totals = cube.period_totals()
+        return _line_chart_png(list(totals.index), totals.tolist())
+    st.image(cube.memo('line_chart_png', render), use_container_width=True)
 
-    category_patterns = category_cfg.categories
-    matrix = []
-    row_labels = []
-    for df in df_list_in_unit:
-        df_list_matched = match_category(df, category_patterns)
-        sums = df_list_matched.groupby('Category')['Amount'].sum()
-        matrix.append(sums)
-        row_labels.append(df['Date'].iloc[0].date())
-    result = pd.DataFrame(matrix).fillna(0)
-    result.index = row_labels
-    st.dataframe(result)
-
+def plot_net_spend(cube: AggregateCube):
+    """
+    输出每个Category在每个时间段的净支出表格。
+    :param cube: AggregateCube of the selected period and unit
+    """
+    st.dataframe(cube.period_category_pivot())
 
+# Analysis units of the dashboard, the periods the ledger can aggregate by
+PERIOD_UNITS = tuple(PERIOD_SQL)
 
 
 # Main